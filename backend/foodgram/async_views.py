@@ -0,0 +1,66 @@
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.http import HttpResponse
+
+executor = ThreadPoolExecutor(max_workers=settings.ASGI_VIEW_THREADS,
+                              thread_name_prefix='foodgram-view')
+
+
+def record_queries(request):
+    # Execute wrappers are per thread, so the profiler's one is installed
+    # again on the worker thread's connection
+    recorder = getattr(request, 'query_recorder', None)
+    if recorder is None:
+        return nullcontext()
+    return connection.execute_wrapper(recorder)
+
+
+def render_response(request, response):
+    # The profiler's template response hook only sees the rendered
+    # response, so the render time is recorded here
+    started = time.perf_counter()
+    response = response.render()
+    timings = getattr(request, 'profiler_timings', None)
+    if timings is not None:
+        timings['render'] += time.perf_counter() - started
+    return response
+
+
+def run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        with record_queries(request):
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = render_response(request, response)
+        if response.streaming:
+            response = buffer_streaming_response(response)
+        return response
+    finally:
+        close_old_connections()
+
+
+def buffer_streaming_response(response):
+    buffered = HttpResponse(b''.join(response.streaming_content),
+                            status=response.status_code)
+    for header, value in response.items():
+        buffered[header] = value
+    return buffered
+
+
+def offload(view):
+    async def async_view(request, *args, **kwargs):
+        context = contextvars.copy_context()
+        call = functools.partial(run_view, view, request, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, context.run, call)
+
+    functools.update_wrapper(async_view, view)
+    return async_view
@@ -0,0 +1,79 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .profiler import QueryRecorder, stats
+
+logger = logging.getLogger('foodgram.profiler')
+
+
+class QueryProfilerMiddleware:
+    def __init__(self, get_response):
+        if not settings.QUERY_PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request.query_recorder = recorder
+        request.profiler_timings = {'serialize': 0.0, 'render': 0.0}
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        serialize = request.profiler_timings['serialize']
+        render = request.profiler_timings['render']
+        other = max(total - recorder.duration - serialize - render, 0.0)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={recorder.duration * 1000:.1f};'
+            f'desc="{recorder.count} queries"',
+            f'serialize;dur={serialize * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'other;dur={other * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        duplicates = {
+            sql: count for sql, count in recorder.fingerprints.items()
+            if count >= settings.QUERY_PROFILER_DUPLICATE_THRESHOLD
+        }
+        endpoint = self.get_endpoint(request)
+        logger.info(json.dumps({
+            'endpoint': endpoint,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 1),
+            'serialize_ms': round(serialize * 1000, 1),
+            'render_ms': round(render * 1000, 1),
+            'other_ms': round(other * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'duplicate_queries': sum(duplicates.values()),
+        }))
+        requests = stats.record(endpoint, {
+            'total': total * 1000,
+            'db': recorder.duration * 1000,
+            'serialize': serialize * 1000,
+            'queries': recorder.count,
+        }, duplicates)
+        if requests % settings.QUERY_PROFILER_DUMP_EVERY == 0:
+            stats.dump()
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.profiler_timings['render'] += (
+                time.perf_counter() - started)
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def get_endpoint(self, request):
+        match = request.resolver_match
+        name = match.view_name if match else request.path
+        return f'{request.method} {name}'
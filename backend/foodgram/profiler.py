@@ -0,0 +1,143 @@
+import glob
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+
+SAMPLES_PER_ENDPOINT = 1000
+TOP_DUPLICATES = 10
+
+NUMBER_RE = re.compile(r'\b\d+(\.\d+)?\b')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+IN_LIST_RE = re.compile(r'\bIN \((?:\?, )*\?\)')
+
+
+def fingerprint(sql):
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(
+            lambda: deque(maxlen=SAMPLES_PER_ENDPOINT))
+        self.duplicates = defaultdict(Counter)
+        self.requests = 0
+
+    def record(self, endpoint, sample, duplicates):
+        with self.lock:
+            self.samples[endpoint].append(sample)
+            self.duplicates[endpoint].update(duplicates)
+            self.requests += 1
+            return self.requests
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                endpoint: {
+                    'samples': list(samples),
+                    'duplicates': dict(
+                        self.duplicates[endpoint].most_common(TOP_DUPLICATES)),
+                }
+                for endpoint, samples in self.samples.items()
+            }
+
+    def dump(self):
+        os.makedirs(settings.QUERY_PROFILER_REPORT_DIR, exist_ok=True)
+        path = os.path.join(settings.QUERY_PROFILER_REPORT_DIR,
+                            f'profile-{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as report:
+            json.dump(self.snapshot(), report)
+        os.replace(f'{path}.tmp', path)
+
+
+def load_reports(report_dir):
+    merged = defaultdict(lambda: {'samples': [], 'duplicates': Counter()})
+    for path in glob.glob(os.path.join(report_dir, 'profile-*.json')):
+        with open(path) as report:
+            for endpoint, data in json.load(report).items():
+                merged[endpoint]['samples'].extend(data['samples'])
+                merged[endpoint]['duplicates'].update(data['duplicates'])
+    return merged
+
+
+def summarize(merged):
+    rows = []
+    for endpoint, data in merged.items():
+        samples = data['samples']
+        totals = [sample['total'] for sample in samples]
+        rows.append({
+            'endpoint': endpoint,
+            'requests': len(samples),
+            'p50': percentile(totals, 0.50),
+            'p95': percentile(totals, 0.95),
+            'p99': percentile(totals, 0.99),
+            'db_p95': percentile([sample['db'] for sample in samples], 0.95),
+            'serialize_p95': percentile(
+                [sample.get('serialize', 0.0) for sample in samples], 0.95),
+            'queries_avg': sum(
+                sample['queries'] for sample in samples) / len(samples),
+            'duplicates': data['duplicates'].most_common(TOP_DUPLICATES),
+        })
+    return sorted(rows, key=lambda row: row['p95'], reverse=True)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+
+class TimedSerializer:
+    def __init__(self, serializer, request):
+        self.serializer = serializer
+        self.request = request
+
+    def __getattr__(self, name):
+        return getattr(self.serializer, name)
+
+    @property
+    def data(self):
+        recorder = self.request.query_recorder
+        started, queries = time.perf_counter(), recorder.duration
+        data = self.serializer.data
+        # Queries run while serializing are already counted as db time
+        self.request.profiler_timings['serialize'] += (
+            time.perf_counter() - started - (recorder.duration - queries))
+        return data
+
+
+class ProfiledSerializerMixin:
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if getattr(self.request, 'query_recorder', None) is None:
+            return serializer
+        return TimedSerializer(serializer, self.request)
+
+
+stats = EndpointStats()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 import environ
 
@@ -29,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.QueryProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,6 +40,29 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+QUERY_PROFILER_ENABLED = bool(
+    os.environ.get('QUERY_PROFILER_ENABLED', default=''))
+QUERY_PROFILER_REPORT_DIR = os.environ.get(
+    'QUERY_PROFILER_REPORT_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram_query_profile'))
+QUERY_PROFILER_DUMP_EVERY = 100
+QUERY_PROFILER_DUPLICATE_THRESHOLD = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.profiler': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -58,6 +83,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+ASGI_MODE = bool(os.environ.get('ASGI_MODE', default=''))
+ASGI_VIEW_THREADS = int(os.environ.get('ASGI_VIEW_THREADS', default=8))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -66,6 +94,16 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT'),
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', default=0)),
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', default='foodgram'),
     }
 }
 
@@ -105,12 +143,24 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
 MEDIA_URL = '/backend_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media')
 
+IMAGE_RENDITION_WORKERS = int(os.environ.get('IMAGE_RENDITION_WORKERS',
+                                             default=2))
+
+RECIPE_SEARCH_CONFIG = os.environ.get('RECIPE_SEARCH_CONFIG',
+                                      default='simple')
+
+POPULARITY_HALF_LIFE_DAYS = float(os.environ.get('POPULARITY_HALF_LIFE_DAYS',
+                                                 default=7))
+
+TIMELINE_FANOUT_LIMIT = int(os.environ.get('TIMELINE_FANOUT_LIMIT',
+                                           default=1000))
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',   # noqa: E501
     'PAGE_SIZE': 6,
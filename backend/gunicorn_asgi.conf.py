@@ -0,0 +1,23 @@
+import os
+
+import django
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+worker_class = 'uvicorn.workers.UvicornWorker'
+keepalive = 5
+timeout = 60
+raw_env = ['ASGI_MODE=1']
+
+
+def on_starting(server):
+    if server.cfg.workers < 2:
+        return
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    from recipes.cache import is_shared_cache
+    # Version stamps and cached documents would diverge between workers
+    if not is_shared_cache():
+        raise RuntimeError(
+            'Several workers need a shared cache, set CACHE_BACKEND or '
+            'GUNICORN_WORKERS=1')
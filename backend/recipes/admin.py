@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import (Favorite, Ingredient, IngredientRecipe, Recipe, RecipeTag,
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                      ShoppingCart, Tag)
 
 
@@ -23,20 +23,18 @@ class IngredientRecipeInline(admin.TabularInline):
 
 
 class RecipeTagInline(admin.TabularInline):
-    model = RecipeTag
+    model = Recipe.tags.through
     min_num = 1
     extra = 0
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'author', 'favorited_by')
+    list_display = ('pk', 'name', 'author', 'favorites_count')
     list_filter = ['name', 'author', 'tags']
+    list_select_related = ('author',)
     inlines = (IngredientRecipeInline, RecipeTagInline)
 
-    def favorited_by(self, obj):
-        return obj.favorited_by.all().count()
-
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .pantry import create_pantry_index
+        from .popularity import validate_half_life
+        from .search import create_search_indexes
+        validate_half_life()
+        post_migrate.connect(create_search_indexes, sender=self)
+        post_migrate.connect(create_pantry_index, sender=self)
@@ -0,0 +1,153 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection, transaction
+from django.db.models import Case, FloatField, Value, When
+from django.utils import timezone
+
+from users.models import Follow, User
+from .counters import update_counter
+from .memberships import refresh_membership
+from .models import Favorite, Recipe, ShoppingCart
+from .popularity import (FAVORITE_WEIGHT, SHOPPING_CART_WEIGHT, add_score,
+                         event_score, remove_score)
+from .timeline import remove_authors, schedule_add_authors
+
+CREATED = 'created'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+BulkRelation = namedtuple('BulkRelation', (
+    'model', 'field', 'target', 'counter', 'weight', 'membership'))
+
+FAVORITES = BulkRelation(Favorite, 'recipe', Recipe, 'favorites_count',
+                         FAVORITE_WEIGHT, 'favorites')
+SHOPPING_CART = BulkRelation(ShoppingCart, 'recipe', Recipe,
+                             'shopping_cart_count', SHOPPING_CART_WEIGHT,
+                             'shopping_cart')
+FOLLOWING = BulkRelation(Follow, 'following', User, 'followers_count', None,
+                         'following')
+
+INSERT_SQL = '''
+    INSERT INTO {table} ({columns}) VALUES {rows}
+    ON CONFLICT DO NOTHING RETURNING {returning}
+'''
+
+bulk_delete = ContextVar('bulk_delete', default=False)
+
+
+@contextmanager
+def deleting_in_bulk():
+    token = bulk_delete.set(True)
+    try:
+        yield
+    finally:
+        bulk_delete.reset(token)
+
+
+def deleted_in_bulk():
+    return bulk_delete.get()
+
+
+def score_rows(relation, rows):
+    return Case(*(When(pk=pk, then=Value(event_score(relation.weight,
+                                                     created_at)))
+                  for pk, created_at in rows),
+                output_field=FloatField())
+
+
+def existing_targets(relation, user, ids):
+    return set(relation.model.objects.filter(**{
+        'user': user, f'{relation.field}_id__in': ids,
+    }).values_list(f'{relation.field}_id', flat=True))
+
+
+def insert_rows(relation, user, pks):
+    field = f'{relation.field}_id'
+    fields = [field, 'created_at'] if relation.weight is not None else [field]
+    if connection.vendor != 'postgresql':
+        # Other backends serialize writers, so the rows read back after the
+        # insert are the ones it created
+        relation.model.objects.bulk_create(
+            [relation.model(user=user, **{field: pk}) for pk in pks],
+            ignore_conflicts=True)
+        return list(relation.model.objects.filter(**{
+            'user': user, f'{field}__in': pks,
+        }).values_list(*fields))
+    # Rows inserted concurrently are skipped by the conflict clause and
+    # left out of RETURNING, so they are not counted twice
+    columns = ['user_id', *fields]
+    values = [user.pk, None, timezone.now()][:len(columns)]
+    params = []
+    for pk in pks:
+        values[1] = pk
+        params.extend(values)
+    row = f'({", ".join(["%s"] * len(columns))})'
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(INSERT_SQL.format(
+            table=quote(relation.model._meta.db_table),
+            columns=', '.join(map(quote, columns)),
+            rows=', '.join([row] * len(pks)),
+            returning=', '.join(map(quote, fields))), params)
+        return cursor.fetchall()
+
+
+@transaction.atomic
+def bulk_add(relation, user, ids):
+    found = set(relation.target.objects.filter(pk__in=ids).values_list(
+        'pk', flat=True))
+    outcomes = {}
+    if relation.target is User and user.pk in found:
+        found.discard(user.pk)
+        outcomes[user.pk] = SELF
+    present = existing_targets(relation, user, found)
+    candidates = sorted(found - present)
+    rows = insert_rows(relation, user, candidates) if candidates else []
+    new = sorted(row[0] for row in rows)
+    # Rows another request inserted in the meantime already existed
+    present |= set(candidates) - set(new)
+    if new:
+        extra = {}
+        if relation.weight is not None:
+            extra['popularity'] = add_score(score_rows(relation, rows))
+        update_counter(relation.target.objects.filter(pk__in=new),
+                       relation.counter, 1, **extra)
+        refresh_membership(user.pk, relation.membership)
+        if relation is FOLLOWING:
+            schedule_add_authors(user.pk, new)
+    outcomes.update(dict.fromkeys(new, CREATED))
+    outcomes.update(dict.fromkeys(present, EXISTS))
+    return [{'id': pk, 'status': outcomes.get(pk, NOT_FOUND)} for pk in ids]
+
+
+@transaction.atomic
+def bulk_remove(relation, user, ids):
+    fields = [f'{relation.field}_id']
+    if relation.weight is not None:
+        fields.append('created_at')
+    queryset = relation.model.objects.filter(**{
+        'user': user, f'{relation.field}_id__in': ids,
+    })
+    rows = list(queryset.values_list(*fields))
+    if rows:
+        # The delete receivers skip their per-row updates, the same
+        # updates run in bulk below
+        with deleting_in_bulk():
+            queryset.delete()
+        extra = {}
+        if relation.weight is not None:
+            extra['popularity'] = remove_score(score_rows(relation, rows))
+        removed = [row[0] for row in rows]
+        update_counter(relation.target.objects.filter(pk__in=removed),
+                       relation.counter, -1, **extra)
+        refresh_membership(user.pk, relation.membership)
+        if relation is FOLLOWING:
+            remove_authors(user.pk, removed)
+    outcomes = dict.fromkeys(ids, ABSENT)
+    outcomes.update(dict.fromkeys((row[0] for row in rows), REMOVED))
+    return [{'id': pk, 'status': outcomes[pk]} for pk in ids]
@@ -0,0 +1,64 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+REFERENCE_CACHE_SIZE = 512
+
+CacheEntry = namedtuple('CacheEntry', ('version', 'data'))
+
+
+def is_shared_cache():
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def version_key(namespace):
+    return f'reference-data:{namespace}:version'
+
+
+def get_version(namespace):
+    version = cache.get(version_key(namespace))
+    if version is None:
+        cache.add(version_key(namespace), int(time.time() * 1000), None)
+        version = cache.get(version_key(namespace))
+    return version
+
+
+def bump_version(namespace):
+    current = cache.get(version_key(namespace)) or 0
+    version = max(int(time.time() * 1000), current + 1)
+    cache.set(version_key(namespace), version, None)
+    return version
+
+
+def make_etag(namespace, key, version):
+    digest = hashlib.sha1(f'{namespace}:{version}:{key}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+class ReferenceDataCache:
+    def __init__(self, max_size=REFERENCE_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, namespace, key, version):
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            if entry is None or entry.version != version:
+                return None
+            self.entries.move_to_end((namespace, key))
+            return entry
+
+    def set(self, namespace, key, version, data):
+        with self.lock:
+            self.entries[(namespace, key)] = CacheEntry(version, data)
+            self.entries.move_to_end((namespace, key))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+reference_cache = ReferenceDataCache()
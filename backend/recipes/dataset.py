@@ -0,0 +1,126 @@
+import datetime
+import gzip
+import json
+import os
+import re
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from users.models import Follow, User
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, Tag)
+
+Stream = namedtuple('Stream', ('name', 'model', 'fields', 'references',
+                               'natural_key'))
+
+STREAMS = (
+    Stream('users', User,
+           ('id', 'email', 'username', 'first_name', 'last_name',
+            'password', 'is_active', 'is_staff', 'is_superuser',
+            'last_login', 'date_joined'),
+           {}, ('email',)),
+    Stream('tags', Tag, ('id', 'name', 'color', 'slug'), {}, ('slug',)),
+    Stream('ingredients', Ingredient, ('id', 'name', 'measurement_unit'),
+           {}, ('name', 'measurement_unit')),
+    Stream('recipes', Recipe,
+           ('id', 'author_id', 'name', 'image', 'text', 'cooking_time',
+            'pub_date'),
+           {'author_id': 'users'}, None),
+    Stream('recipe_ingredients', IngredientRecipe,
+           ('recipe_id', 'ingredient_id', 'amount'),
+           {'recipe_id': 'recipes', 'ingredient_id': 'ingredients'}, None),
+    Stream('recipe_tags', Recipe.tags.through, ('recipe_id', 'tag_id'),
+           {'recipe_id': 'recipes', 'tag_id': 'tags'}, None),
+    Stream('favorites', Favorite, ('user_id', 'recipe_id', 'created_at'),
+           {'user_id': 'users', 'recipe_id': 'recipes'}, None),
+    Stream('shopping_cart', ShoppingCart,
+           ('user_id', 'recipe_id', 'created_at'),
+           {'user_id': 'users', 'recipe_id': 'recipes'}, None),
+    Stream('follows', Follow, ('user_id', 'following_id'),
+           {'user_id': 'users', 'following_id': 'users'}, None),
+)
+
+JSONL_EXTENSION = '.jsonl'
+GZIP_EXTENSION = '.gz'
+
+
+def chunk_name(stream, index, compress):
+    name = f'{stream.name}.{index:05d}{JSONL_EXTENSION}'
+    return name + GZIP_EXTENSION if compress else name
+
+
+def stream_files(directory, stream):
+    pattern = re.compile(rf'{stream.name}\.\d+\.jsonl(\.gz)?')
+    return sorted(name for name in os.listdir(directory)
+                  if pattern.fullmatch(name))
+
+
+def open_chunk(path, mode='rt'):
+    if path.endswith(GZIP_EXTENSION):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class DatasetEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dump_line(record):
+    return json.dumps(record, cls=DatasetEncoder,
+                      separators=(',', ':')) + '\n'
+
+
+@contextmanager
+def preserve_timestamps(model):
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class IdMap:
+    def __init__(self, old=None, new=None):
+        self.old = old if old is not None else array('q')
+        self.new = new if new is not None else array('q')
+
+    def __len__(self):
+        return len(self.old)
+
+    def add(self, old, new):
+        if self.old and old <= self.old[-1]:
+            raise ValueError('Ids must be added in ascending order')
+        self.old.append(old)
+        self.new.append(new)
+
+    def get(self, old):
+        position = bisect_left(self.old, old)
+        if position < len(self.old) and self.old[position] == old:
+            return self.new[position]
+        return None
+
+    def save(self, path):
+        with open(path, 'wb') as stream:
+            stream.write(len(self.old).to_bytes(8, 'little'))
+            self.old.tofile(stream)
+            self.new.tofile(stream)
+
+    @classmethod
+    def load(cls, path):
+        old, new = array('q'), array('q')
+        with open(path, 'rb') as stream:
+            size = int.from_bytes(stream.read(8), 'little')
+            old.fromfile(stream, size)
+            new.fromfile(stream, size)
+        return cls(old, new)
@@ -0,0 +1,51 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .cache import get_version
+from .models import IngredientRecipe
+
+DOCUMENT_TIMEOUT = 24 * 60 * 60
+PAGE_TIMEOUT = 5 * 60
+
+DOCUMENT_PREFETCH = (
+    'tags',
+    Prefetch('ingredientrecipe_set',
+             queryset=IngredientRecipe.objects.select_related('ingredient')),
+)
+
+
+def document_key(recipe, versions, variant):
+    author = recipe.author
+    source = repr((recipe.pk, recipe.updated_at.isoformat(), author.pk,
+                   author.email, author.username, author.first_name,
+                   author.last_name, versions, variant))
+    return f'recipe-document:{hashlib.sha1(source.encode()).hexdigest()}'
+
+
+def get_recipe_documents(recipes, variant, build):
+    versions = (get_version('tags'), get_version('ingredients'))
+    keys = [document_key(recipe, versions, variant) for recipe in recipes]
+    documents = cache.get_many(keys)
+    missing = [(key, recipe) for key, recipe in zip(keys, recipes)
+               if key not in documents]
+    if missing:
+        prefetch_related_objects([recipe for _, recipe in missing],
+                                 *DOCUMENT_PREFETCH)
+        built = {key: build(recipe) for key, recipe in missing}
+        cache.set_many(built, DOCUMENT_TIMEOUT)
+        documents.update(built)
+    return [documents[key] for key in keys]
+
+
+def page_key(etag):
+    return f'recipe-page:{etag}'
+
+
+def get_cached_page(etag):
+    return cache.get(page_key(etag))
+
+
+def set_cached_page(etag, data):
+    cache.set(page_key(etag), data, PAGE_TIMEOUT)
@@ -0,0 +1,12 @@
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    def to_representation(self, renditions):
+        request = self.context.get('request')
+        urls = {}
+        for label, name in (renditions or {}).items():
+            url = default_storage.url(name)
+            urls[label] = request.build_absolute_uri(url) if request else url
+        return urls
@@ -1,34 +1,71 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from .models import Ingredient, Recipe
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .search import get_search_limit, search_ingredients, search_recipes
+
+ORDERING_CHOICES = (
+    ('popular', 'Popular'),
+)
 
 
 class IngredientsFilter(filters.FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='istartswith')
+    name = filters.CharFilter(method='search_name', label='Name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def search_name(self, queryset, name, value):
+        limit = get_search_limit(self.data.get('limit'))
+        return search_ingredients(queryset, value, limit)
+
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug',
-                                           label='Tags')
+    tags = filters.ModelMultipleChoiceFilter(queryset=Tag.objects.all(),
+                                             to_field_name='slug',
+                                             method='get_tags',
+                                             label='Tags')
     is_favorited = filters.BooleanFilter(method='get_favorite',
                                          label='Favorited')
     is_in_shopping_cart = filters.BooleanFilter(method='get_shopping',
                                                 label='Is in shopping cart')
+    search = filters.CharFilter(method='get_search', label='Search')
+    ordering = filters.ChoiceFilter(choices=ORDERING_CHOICES,
+                                    method='get_ordering', label='Ordering')
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'author', 'tags', 'is_in_shopping_cart')
+        fields = ('is_favorited', 'author', 'tags', 'is_in_shopping_cart',
+                  'search', 'ordering')
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value)))
+
+    def get_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by('-popularity', '-id')
+        return queryset
 
     def get_favorite(self, queryset, name, value):
-        if value:
-            return Recipe.objects.filter(favorited_by__user=self.request.user)
-        return Recipe.objects.all()
+        return self.filter_user_relation(queryset, Favorite, value)
 
     def get_shopping(self, queryset, name, value):
-        if value:
-            return Recipe.objects.filter(shoppingcart__user=self.request.user)
-        return Recipe.objects.all()
+        return self.filter_user_relation(queryset, ShoppingCart, value)
+
+    def filter_user_relation(self, queryset, model, value):
+        if not value:
+            return queryset
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk'))))
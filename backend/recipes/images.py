@@ -0,0 +1,111 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1600,
+}
+RENDITIONS_DIR = 'recipes/renditions'
+IMAGE_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+IMAGE_QUALITY = 80
+
+executor = ThreadPoolExecutor(
+    max_workers=max(settings.IMAGE_RENDITION_WORKERS, 1),
+    thread_name_prefix='image-renditions',
+)
+
+
+def encode_rendition(image, size):
+    rendition = image.copy()
+    rendition.thumbnail((size, size), Image.LANCZOS)
+    if IMAGE_FORMAT == 'JPEG' and rendition.mode != 'RGB':
+        rendition = rendition.convert('RGB')
+    buffer = io.BytesIO()
+    rendition.save(buffer, IMAGE_FORMAT, quality=IMAGE_QUALITY,
+                   optimize=True)
+    return buffer.getvalue()
+
+
+def save_rendition(label, content):
+    digest = hashlib.sha1(content).hexdigest()[:16]
+    extension = IMAGE_FORMAT.lower()
+    name = os.path.join(RENDITIONS_DIR, f'{digest}_{label}.{extension}')
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def discard_renditions(renditions, keep=()):
+    # Renditions are named by content, so identical images share files
+    for label, name in renditions.items():
+        if name in keep or Recipe.objects.filter(
+                **{f'image_renditions__{label}': name}).exists():
+            continue
+        default_storage.delete(name)
+
+
+def build_renditions(recipe_id, image_name, stale=None):
+    try:
+        with default_storage.open(image_name) as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands()
+                                  else 'RGB')
+        renditions = {
+            label: save_rendition(label, encode_rendition(image, size))
+            for label, size in RENDITIONS.items()
+        }
+        with transaction.atomic():
+            previous = Recipe.objects.select_for_update().filter(
+                pk=recipe_id, image=image_name).values_list(
+                'image_renditions', flat=True).first()
+            if previous is not None:
+                Recipe.objects.filter(pk=recipe_id).update(
+                    image_renditions=renditions, updated_at=timezone.now())
+        # Without a match the image was replaced meanwhile and its own
+        # build stores the set, so this one is dropped as well
+        keep = renditions.values() if previous is not None else ()
+        for replaced in (stale or {}, previous or {}):
+            discard_renditions(replaced, keep)
+        if previous is None:
+            discard_renditions(renditions)
+            return None
+        return renditions
+    except Exception:
+        logger.exception('Failed to build renditions for recipe %s',
+                         recipe_id)
+        return None
+
+
+def build_renditions_in_worker(recipe_id, image_name, stale):
+    try:
+        return build_renditions(recipe_id, image_name, stale)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(recipe, stale=None):
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    if not settings.IMAGE_RENDITION_WORKERS:
+        transaction.on_commit(
+            lambda: build_renditions(recipe_id, image_name, stale))
+        return
+    transaction.on_commit(
+        lambda: executor.submit(build_renditions_in_worker, recipe_id,
+                                image_name, stale))
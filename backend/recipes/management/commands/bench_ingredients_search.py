@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Ingredient
+from recipes.search import DEFAULT_SEARCH_LIMIT, search_ingredients
+from recipes.serializers import IngredientsSerializer
+
+
+def legacy_search(value, limit):
+    return Ingredient.objects.filter(name__istartswith=value)
+
+
+def indexed_search(value, limit):
+    return search_ingredients(Ingredient.objects.all(), value, limit)[:limit]
+
+
+class Command(BaseCommand):
+    help = 'Compare ingredient autocomplete latency against the old filter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=DEFAULT_SEARCH_LIMIT)
+
+    def handle(self, *args, **options):
+        names = Ingredient.objects.values_list('name', flat=True)
+        # The first keystrokes of every ingredient name, as typed in
+        # the recipe editor, plus the empty query sent on focus.
+        queries = {''}
+        for name in names:
+            for length in range(1, min(len(name), 4) + 1):
+                queries.add(name[:length])
+        queries = sorted(queries)
+        for label, search in (('istartswith', legacy_search),
+                              ('indexed', indexed_search)):
+            timings = []
+            for _ in range(options['rounds']):
+                for value in queries:
+                    started = time.perf_counter()
+                    IngredientsSerializer(search(value, options['limit']),
+                                          many=True).data
+                    timings.append((time.perf_counter() - started) * 1000)
+            percentiles = statistics.quantiles(timings, n=100)
+            self.stdout.write(
+                f'{label:>12}: {len(timings)} requests, '
+                f'p50 {percentiles[49]:.2f} ms, '
+                f'p95 {percentiles[94]:.2f} ms, '
+                f'max {max(timings):.2f} ms')
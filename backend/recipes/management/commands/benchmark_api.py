@@ -0,0 +1,125 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from foodgram.profiler import percentile
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+REGRESSION_TOLERANCE = 1.2
+REGRESSION_SLACK_MS = 5
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main API endpoints against the current database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--output', help='Write results as JSON')
+        parser.add_argument('--baseline',
+                            help='Compare against a saved JSON baseline')
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('-recipes_count').first()
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        if user is None or recipe is None:
+            raise CommandError('No data to benchmark, '
+                               'run generate_fake_data first')
+        client = Client(HTTP_HOST='localhost')
+        token, _ = Token.objects.get_or_create(user=user)
+        auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        ingredient = Ingredient.objects.values_list('name', flat=True).first()
+        endpoints = {
+            'recipe list': ('/api/recipes/', {}),
+            'recipe list, deep page': ('/api/recipes/?page=100', {}),
+            'recipe detail': (f'/api/recipes/{recipe.pk}/', auth),
+            'filter by tag': (f'/api/recipes/?tags={tag}', auth),
+            'filter by author': (f'/api/recipes/?author={user.pk}', auth),
+            'filter favorites': ('/api/recipes/?is_favorited=1', auth),
+            'filter shopping cart': (
+                '/api/recipes/?is_in_shopping_cart=1', auth),
+            'subscriptions': (
+                '/api/users/subscriptions/?recipes_limit=3', auth),
+            'download shopping cart': (
+                '/api/recipes/download_shopping_cart/', auth),
+            'ingredient search': (
+                f'/api/ingredients/?name={(ingredient or "")[:2]}', {}),
+            'tags': ('/api/tags/', {}),
+        }
+        results = {}
+        for name, (url, headers) in endpoints.items():
+            results[name] = self.measure(client, url, headers, options)
+            self.report(name, results[name])
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+        if options['baseline']:
+            self.compare(results, options['baseline'])
+
+    def measure(self, client, url, headers, options):
+        for _ in range(options['warmup']):
+            self.request(client, url, headers)
+        timings, queries = [], []
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            request_started = time.perf_counter()
+            with CaptureQueriesContext(connection) as context:
+                status = self.request(client, url, headers)
+            timings.append((time.perf_counter() - request_started) * 1000)
+            queries.append(len(context.captured_queries))
+        elapsed = time.perf_counter() - started
+        return {
+            'url': url,
+            'status': status,
+            'throughput': options['requests'] / elapsed,
+            'p50': percentile(timings, 0.50),
+            'p95': percentile(timings, 0.95),
+            'p99': percentile(timings, 0.99),
+            'queries': max(queries),
+        }
+
+    def request(self, client, url, headers):
+        response = client.get(url, **headers)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<25} {result["status"]:>4} '
+            f'{result["throughput"]:>8.1f} req/s  '
+            f'p50 {result["p50"]:>7.1f} ms  p95 {result["p95"]:>7.1f} ms  '
+            f'p99 {result["p99"]:>7.1f} ms  {result["queries"]:>3} queries')
+
+    def compare(self, results, path):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            allowed = (previous['p95'] * REGRESSION_TOLERANCE
+                       + REGRESSION_SLACK_MS)
+            if result['p95'] > allowed:
+                regressions.append(
+                    f'{name}: p95 {previous["p95"]:.1f} -> '
+                    f'{result["p95"]:.1f} ms')
+            if result['queries'] > previous['queries']:
+                regressions.append(
+                    f'{name}: queries {previous["queries"]} -> '
+                    f'{result["queries"]}')
+        if regressions:
+            raise CommandError('Regressions against baseline:\n'
+                               + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against '
+                                             f'{path}'))
@@ -0,0 +1,166 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.profiler import percentile
+
+SERVERS = {
+    'sync': ('foodgram.wsgi:application', '--worker-class', 'sync'),
+    'asgi': ('foodgram.asgi:application', '--config',
+             os.path.join(settings.BASE_DIR, 'gunicorn_asgi.conf.py')),
+}
+STARTUP_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def read_parents():
+    parents = {}
+    for entry in os.listdir('/proc'):
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                parents[int(entry)] = int(
+                    stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError):
+            continue
+    return parents
+
+
+def read_rss(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(pid):
+    parents = read_parents()
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(child for child, parent in parents.items()
+                       if parent == current)
+    return sum(read_rss(member) for member in tree)
+
+
+class Command(BaseCommand):
+    help = ('Compare gunicorn sync workers with uvicorn ASGI workers '
+            'under concurrent and slow clients')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/recipes/')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', default='1,8,32',
+                            help='Comma separated client counts')
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--slow-clients', type=int, default=0,
+                            help='Clients that trickle their headers')
+        parser.add_argument('--modes', default='sync,asgi')
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        for mode in options['modes'].split(','):
+            if mode not in SERVERS:
+                raise CommandError(f'Unknown mode: {mode}')
+            port = free_port()
+            server = self.start(mode, port, options['workers'])
+            try:
+                self.request(port, options['url'])
+                rss = process_tree_rss(server.pid) / 2 ** 20
+                for level in levels:
+                    result = self.load(port, options['url'], level,
+                                       options['duration'],
+                                       options['slow_clients'])
+                    self.stdout.write(
+                        f'{mode:<5} {level:>4} clients  '
+                        f'{result["throughput"]:>8.1f} req/s  '
+                        f'p50 {result["p50"]:>7.1f} ms  '
+                        f'p95 {result["p95"]:>7.1f} ms  '
+                        f'{result["errors"]:>4} errors  {rss:>6.1f} MiB')
+            finally:
+                server.terminate()
+                server.wait()
+
+    def start(self, mode, port, workers):
+        application, *extra = SERVERS[mode]
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', application, *extra,
+             '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+             '--log-level', 'warning'],
+            cwd=settings.BASE_DIR)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+                return server
+            except OSError:
+                if server.poll() is not None:
+                    break
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'The {mode} server did not start')
+
+    def request(self, port, url, connection=None):
+        connection = connection or http.client.HTTPConnection(
+            '127.0.0.1', port, timeout=30)
+        connection.request('GET', url)
+        response = connection.getresponse()
+        response.read()
+        return connection, response.status
+
+    def load(self, port, url, clients, duration, slow_clients):
+        deadline = time.monotonic() + duration
+        results = []
+        threads = [threading.Thread(target=self.slow_client,
+                                    args=(port, url, deadline))
+                   for _ in range(slow_clients)]
+        threads += [threading.Thread(target=self.client,
+                                     args=(port, url, deadline, results))
+                    for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        timings = [elapsed for elapsed, status in results if status == 200]
+        return {
+            'throughput': len(timings) / duration,
+            'p50': percentile(timings, 0.50),
+            'p95': percentile(timings, 0.95),
+            'errors': len(results) - len(timings),
+        }
+
+    def client(self, port, url, deadline, results):
+        connection = None
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                connection, status = self.request(port, url, connection)
+            except (OSError, http.client.HTTPException):
+                connection, status = None, None
+            results.append(((time.perf_counter() - started) * 1000, status))
+
+    def slow_client(self, port, url, deadline):
+        try:
+            with socket.create_connection(('127.0.0.1', port)) as sock:
+                sock.sendall(f'GET {url} HTTP/1.1\r\n'.encode())
+                while time.monotonic() < deadline:
+                    sock.sendall(b'X-Slow: 1\r\n')
+                    time.sleep(1)
+        except OSError:
+            pass
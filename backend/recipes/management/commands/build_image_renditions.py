@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Build resized image renditions for recipes that lack them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild renditions for every recipe')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_renditions={})
+        built = 0
+        for recipe_id, image_name in recipes.values_list(
+                'pk', 'image').iterator():
+            if build_renditions(recipe_id, image_name) is not None:
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Built renditions for {built} recipes'))
@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.dataset import (STREAMS, chunk_name, dump_line, open_chunk,
+                             stream_files)
+
+
+class Command(BaseCommand):
+    help = ('Stream users, recipes and their relations into chunked '
+            '(optionally gzip-compressed) JSON lines files')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--rows-per-file', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        os.makedirs(directory, exist_ok=True)
+        if any(stream_files(directory, stream) for stream in STREAMS):
+            raise CommandError(f'{directory} already contains a dump')
+        started = time.perf_counter()
+        total = 0
+        for stream in STREAMS:
+            written = self.dump_stream(directory, stream, options)
+            total += written
+            self.stdout.write(f'{stream.name}: {written} rows')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Dumped {total} rows in {elapsed:.2f} s '
+            f'({total / max(elapsed, 1e-9):.0f} rows/sec)'))
+
+    def dump_stream(self, directory, stream, options):
+        rows = stream.model.objects.order_by('pk').values_list(
+            *stream.fields).iterator(chunk_size=options['batch_size'])
+        written, output = 0, None
+        for row in rows:
+            if written % options['rows_per_file'] == 0:
+                if output is not None:
+                    output.close()
+                name = chunk_name(stream,
+                                  written // options['rows_per_file'],
+                                  options['gzip'])
+                output = open_chunk(os.path.join(directory, name), 'wt')
+            output.write(dump_line(dict(zip(stream.fields, row))))
+            written += 1
+        if output is not None:
+            output.close()
+        return written
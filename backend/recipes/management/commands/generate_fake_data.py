@@ -0,0 +1,186 @@
+import io
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from PIL import Image
+
+from recipes.cache import bump_version
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from recipes.search import reset_ingredient_trie
+from recipes.utils import chunks
+from users.models import Follow, User
+
+IMAGE_NAME = 'recipes/synthetic.png'
+PASSWORD = 'synthetic-password'
+
+
+def zipf_weights(size, alpha):
+    return list(accumulate(1 / (rank + 1) ** alpha for rank in range(size)))
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible synthetic dataset for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags', type=int, default=6)
+        parser.add_argument('--ingredients', type=int, default=2000,
+                            help='Catalog size to create when it is empty')
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=5)
+        parser.add_argument('--follows-per-user', type=int, default=10)
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='Zipf exponent of popularity')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.ensure_image()
+        tags = self.create_tags(options['tags'])
+        ingredients = self.create_ingredients(options['ingredients'])
+        users = self.create_users(options['users'])
+        recipes = self.create_recipes(users, options['recipes'],
+                                      options['alpha'])
+        self.create_recipe_relations(recipes, tags, ingredients,
+                                     options['ingredients_per_recipe'])
+        self.create_user_relations(Favorite, 'recipe', users, recipes,
+                                   options['favorites_per_user'],
+                                   options['alpha'])
+        self.create_user_relations(ShoppingCart, 'recipe', users, recipes,
+                                   options['cart_per_user'],
+                                   options['alpha'])
+        self.create_user_relations(Follow, 'following', users, users,
+                                   options['follows_per_user'],
+                                   options['alpha'])
+        call_command('recount_counters', stdout=self.stdout)
+        call_command('refresh_popularity', stdout=self.stdout)
+        call_command('update_search_vectors', stdout=self.stdout)
+        call_command('update_ingredient_sets', stdout=self.stdout)
+        call_command('refresh_similar_recipes', stdout=self.stdout)
+        call_command('rebuild_timelines', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(users)} users and {len(recipes)} recipes'))
+
+    def bulk_create(self, model, objects):
+        for chunk in chunks(objects, self.batch_size):
+            model.objects.bulk_create(chunk, ignore_conflicts=True)
+
+    def ensure_image(self):
+        if default_storage.exists(IMAGE_NAME):
+            return
+        buffer = io.BytesIO()
+        Image.new('RGB', (480, 320), (230, 160, 60)).save(buffer, 'PNG')
+        default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+
+    def create_tags(self, count):
+        start = next_id(Tag)
+        missing = count - Tag.objects.count()
+        self.bulk_create(Tag, (
+            Tag(name=f'Tag {start + index}', slug=f'tag-{start + index}',
+                color=self.random.choice(Tag.COLORS_CHOICES)[0])
+            for index in range(max(missing, 0))
+        ))
+        bump_version('tags')
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def create_ingredients(self, count):
+        if not Ingredient.objects.exists():
+            self.bulk_create(Ingredient, (
+                Ingredient(name=f'ingredient {index}',
+                           measurement_unit=self.random.choice(
+                               ('g', 'ml', 'pcs', 'tbsp')))
+                for index in range(count)
+            ))
+            bump_version('ingredients')
+            reset_ingredient_trie()
+        return list(Ingredient.objects.values_list('pk', flat=True))
+
+    def create_users(self, count):
+        start = next_id(User)
+        password = make_password(PASSWORD)
+        self.bulk_create(User, (
+            User(email=f'user{start + index}@example.com',
+                 username=f'user{start + index}',
+                 first_name='Synthetic', last_name=f'User {start + index}',
+                 password=password)
+            for index in range(count)
+        ))
+        return list(User.objects.filter(pk__gte=start).order_by(
+            'pk').values_list('pk', flat=True))
+
+    def create_recipes(self, users, count, alpha):
+        start = next_id(Recipe)
+        weights = zipf_weights(len(users), alpha)
+        authors = self.random.choices(users, cum_weights=weights, k=count)
+        self.bulk_create(Recipe, (
+            Recipe(author_id=author, name=f'Recipe {start + index}',
+                   image=IMAGE_NAME,
+                   text=f'Synthetic recipe number {start + index}.',
+                   cooking_time=self.random.randint(5, 180))
+            for index, author in enumerate(authors)
+        ))
+        return list(Recipe.objects.filter(pk__gte=start).order_by(
+            'pk').values_list('pk', flat=True))
+
+    def create_recipe_relations(self, recipes, tags, ingredients, per_recipe):
+        weights = zipf_weights(len(ingredients), 0.8)
+        per_recipe = min(per_recipe, len(ingredients))
+
+        def recipe_ingredients():
+            for recipe in recipes:
+                for ingredient in self.sample(ingredients, weights,
+                                              per_recipe):
+                    yield IngredientRecipe(recipe_id=recipe,
+                                           ingredient_id=ingredient,
+                                           amount=self.random.randint(1, 500))
+
+        recipe_tag = Recipe.tags.through
+
+        def recipe_tags():
+            for recipe in recipes:
+                for tag in self.random.sample(
+                        tags, self.random.randint(1, min(3, len(tags)))):
+                    yield recipe_tag(recipe_id=recipe, tag_id=tag)
+
+        self.bulk_create(IngredientRecipe, recipe_ingredients())
+        self.bulk_create(recipe_tag, recipe_tags())
+
+    def create_user_relations(self, model, field, users, targets, mean,
+                              alpha):
+        weights = zipf_weights(len(targets), alpha)
+
+        def relations():
+            for user in users:
+                count = min(int(self.random.paretovariate(1.5) * mean / 3),
+                            len(targets) - 1)
+                for target in self.sample(targets, weights, count):
+                    if field == 'following' and target == user:
+                        continue
+                    yield model(user_id=user, **{f'{field}_id': target})
+
+        self.bulk_create(model, relations())
+
+    def sample(self, population, weights, count):
+        chosen = set()
+        attempts = 0
+        while len(chosen) < count and attempts < count * 10:
+            chosen.update(self.random.choices(population,
+                                              cum_weights=weights,
+                                              k=count - len(chosen)))
+            attempts += 1
+        return chosen
@@ -0,0 +1,158 @@
+import json
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cache import bump_version
+from recipes.dataset import (STREAMS, IdMap, open_chunk, preserve_timestamps,
+                             stream_files)
+from recipes.search import reset_ingredient_trie
+from recipes.utils import chunks
+
+REFRESH_COMMANDS = (
+    'recount_counters', 'refresh_popularity', 'update_search_vectors',
+    'update_ingredient_sets', 'refresh_similar_recipes', 'rebuild_timelines',
+)
+
+
+class Command(BaseCommand):
+    help = ('Load a dump_dataset directory with batched inserts, remapping '
+            'ids and resuming from the last completed file')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--checkpoint',
+                            help='Defaults to load_checkpoint.json in the '
+                                 'dump directory')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore an existing checkpoint')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f'{directory} is not a directory')
+        self.checkpoint = options['checkpoint'] or os.path.join(
+            directory, 'load_checkpoint.json')
+        done = set() if options['restart'] else self.read_checkpoint()
+        self.maps = {stream.name: self.read_map(stream, options['restart'])
+                     for stream in STREAMS if 'id' in stream.fields}
+        started = time.perf_counter()
+        loaded = skipped = 0
+        for stream in STREAMS:
+            for name in stream_files(directory, stream):
+                if name in done:
+                    continue
+                with transaction.atomic():
+                    counts = self.load_file(stream,
+                                            os.path.join(directory, name),
+                                            options['batch_size'])
+                loaded, skipped = loaded + counts[0], skipped + counts[1]
+                done.add(name)
+                self.write_checkpoint(stream, done)
+                self.stdout.write(f'{name}: {counts[0]} rows loaded, '
+                                  f'{counts[1]} skipped')
+        elapsed = time.perf_counter() - started
+        for command in REFRESH_COMMANDS:
+            call_command(command, stdout=self.stdout)
+        bump_version('tags')
+        bump_version('ingredients')
+        reset_ingredient_trie()
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {loaded} rows ({skipped} skipped) in {elapsed:.2f} s '
+            f'({loaded / max(elapsed, 1e-9):.0f} rows/sec)'))
+
+    def map_path(self, stream):
+        return f'{self.checkpoint}.{stream.name}.idmap'
+
+    def read_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return set()
+        with open(self.checkpoint, encoding='utf-8') as source:
+            return set(json.load(source)['done'])
+
+    def read_map(self, stream, restart):
+        path = self.map_path(stream)
+        if restart or not os.path.exists(path):
+            return IdMap()
+        return IdMap.load(path)
+
+    def write_checkpoint(self, stream, done):
+        if stream.name in self.maps:
+            self.maps[stream.name].save(self.map_path(stream))
+        with open(self.checkpoint, 'w', encoding='utf-8') as output:
+            json.dump({'done': sorted(done)}, output)
+
+    def load_file(self, stream, path, batch_size):
+        loaded = skipped = 0
+        with open_chunk(path) as lines, preserve_timestamps(stream.model):
+            rows = (json.loads(line) for line in lines if line.strip())
+            for batch in chunks(rows, batch_size):
+                records, missing = self.remap(stream, batch)
+                if stream.natural_key:
+                    self.load_natural(stream, records)
+                elif 'id' in stream.fields:
+                    self.load_new(stream, records)
+                else:
+                    stream.model.objects.bulk_create(
+                        [self.build(stream, record) for record in records],
+                        ignore_conflicts=True)
+                loaded += len(records)
+                skipped += missing
+        return loaded, skipped
+
+    def remap(self, stream, records):
+        remapped = []
+        for record in records:
+            for field, source in stream.references.items():
+                record[field] = self.maps[source].get(record[field])
+            if None not in (record[field] for field in stream.references):
+                remapped.append(record)
+        return remapped, len(records) - len(remapped)
+
+    def build(self, stream, record):
+        return stream.model(**{field: record[field]
+                               for field in stream.fields if field != 'id'})
+
+    def lookup(self, stream, keys):
+        field = stream.natural_key[0]
+        rows = stream.model.objects.filter(**{
+            f'{field}__in': {key[0] for key in keys},
+        }).values_list('pk', *stream.natural_key)
+        return {tuple(row[1:]): row[0] for row in rows
+                if tuple(row[1:]) in keys}
+
+    def load_natural(self, stream, records):
+        keys = {tuple(record[field] for field in stream.natural_key): record
+                for record in records}
+        existing = self.lookup(stream, keys)
+        stream.model.objects.bulk_create(
+            [self.build(stream, record) for key, record in keys.items()
+             if key not in existing],
+            ignore_conflicts=True)
+        existing.update(self.lookup(stream, keys.keys() - existing.keys()))
+        for record in records:
+            key = tuple(record[field] for field in stream.natural_key)
+            if key not in existing:
+                raise CommandError(
+                    f'{stream.name} row {record["id"]} conflicts with an '
+                    f'existing row')
+            self.maps[stream.name].add(record['id'], existing[key])
+
+    def load_new(self, stream, records):
+        model = stream.model
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        created = model.objects.bulk_create(
+            [self.build(stream, record) for record in records])
+        pks = [obj.pk for obj in created]
+        if None in pks:
+            # Backends that return no ids from bulk inserts assign them in
+            # insertion order within the transaction
+            pks = list(model.objects.filter(pk__gt=last).order_by(
+                'pk').values_list('pk', flat=True))
+        for record, pk in zip(records, pks):
+            self.maps[stream.name].add(record['id'], pk)
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.cache import bump_version
+from recipes.models import Ingredient
+from recipes.search import reset_ingredient_trie
+from recipes.utils import chunks
+
+READ_CHUNK_SIZE = 64 * 1024
+
+STAGING_TABLE_SQL = '''
+    CREATE TEMP TABLE ingredient_staging (
+        name varchar(200), measurement_unit varchar(200)
+    ) ON COMMIT DROP
+'''
+# Unquoted empty fields are NULL in CSV COPY, blank units must stay ''
+COPY_SQL = ('COPY ingredient_staging (name, measurement_unit) FROM STDIN '
+            'WITH (FORMAT csv, FORCE_NOT_NULL (measurement_unit))')
+MERGE_SQL = '''
+    INSERT INTO {table} (name, measurement_unit)
+    SELECT DISTINCT name, measurement_unit FROM ingredient_staging
+    ON CONFLICT DO NOTHING
+'''
+
+
+def iter_json_array(stream, chunk_size=READ_CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buffer, opened, eof = '', False, False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer and not opened:
+            if buffer[0] != '[':
+                raise CommandError('Expected a JSON array')
+            buffer, opened = buffer[1:], True
+            continue
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Malformed or unterminated JSON array')
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+        else:
+            yield item
+            buffer = buffer[end:]
+
+
+def iter_json_lines(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = ('Stream an ingredient catalog (JSON array, JSON lines or CSV '
+            'with name and measurement_unit columns) into the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, '-' for stdin")
+        parser.add_argument('--format', choices=('json', 'jsonl', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or self.detect_format(options['path'])
+        started = time.perf_counter()
+        before = Ingredient.objects.count()
+        postgres = connection.vendor == 'postgresql'
+        read = 0
+        with self.open(options['path']) as stream, transaction.atomic():
+            if postgres:
+                with connection.cursor() as cursor:
+                    cursor.execute(STAGING_TABLE_SQL)
+            for batch in chunks(self.read_rows(stream, file_format),
+                                options['batch_size']):
+                if postgres:
+                    self.copy_batch(batch)
+                else:
+                    self.bulk_create_batch(batch)
+                read += len(batch)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{read} rows read')
+        created = Ingredient.objects.count() - before
+        bump_version('ingredients')
+        reset_ingredient_trie()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {read} rows, created {created} ingredients in '
+            f'{elapsed:.2f} s ({read / max(elapsed, 1e-9):.0f} rows/sec)'))
+
+    def detect_format(self, path):
+        extension = os.path.splitext(path)[1].lower().lstrip('.')
+        if extension not in ('json', 'jsonl', 'csv'):
+            raise CommandError('Cannot detect the input format, '
+                               'pass --format')
+        return extension
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        return open(path, encoding='utf-8', newline='')
+
+    def read_rows(self, stream, file_format):
+        if file_format == 'csv':
+            records = csv.DictReader(stream)
+        elif file_format == 'jsonl':
+            records = iter_json_lines(stream)
+        else:
+            records = iter_json_array(stream)
+        for record in records:
+            fields = record.get('fields', record)
+            name = (fields.get('name') or '').strip()
+            measurement_unit = (fields.get('measurement_unit') or '').strip()
+            if name:
+                yield name, measurement_unit
+
+    def copy_batch(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(COPY_SQL, buffer)
+            cursor.execute(MERGE_SQL.format(
+                table=connection.ops.quote_name(Ingredient._meta.db_table)))
+            cursor.execute('TRUNCATE ingredient_staging')
+
+    def bulk_create_batch(self, batch):
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=measurement_unit)
+             for name, measurement_unit in dict.fromkeys(batch)),
+            ignore_conflicts=True)
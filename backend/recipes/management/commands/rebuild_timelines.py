@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.timeline import rebuild_timelines
+from recipes.utils import chunks
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the subscription timelines of all followers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        user_ids = Follow.objects.order_by('user_id').values_list(
+            'user_id', flat=True).distinct().iterator()
+        rebuilt = 0
+        for chunk in chunks(user_ids, options['batch_size']):
+            rebuild_timelines(chunk)
+            rebuilt += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt timelines of {rebuilt} users'))
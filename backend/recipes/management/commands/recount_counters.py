@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import count_subquery
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized favorite, recipe and follower counters'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = Recipe.objects.update(
+                favorites_count=count_subquery(Favorite, 'recipe'),
+                shopping_cart_count=count_subquery(ShoppingCart, 'recipe'),
+            )
+            users = User.objects.update(
+                recipes_count=count_subquery(Recipe, 'author'),
+                followers_count=count_subquery(Follow, 'following'),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {recipes} recipes and {users} users'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.popularity import (FAVORITE_WEIGHT, SHOPPING_CART_WEIGHT,
+                                compute_popularity)
+from recipes.utils import chunks
+
+
+class Command(BaseCommand):
+    help = 'Recompute time-decayed recipe popularity scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        scores = compute_popularity((
+            (Favorite, FAVORITE_WEIGHT),
+            (ShoppingCart, SHOPPING_CART_WEIGHT),
+        ))
+        with transaction.atomic():
+            Recipe.objects.exclude(popularity=0).update(popularity=0)
+            for chunk in chunks(scores.items(), options['batch_size']):
+                Recipe.objects.bulk_update(
+                    [Recipe(pk=pk, popularity=score) for pk, score in chunk],
+                    ['popularity'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed popularity of {len(scores)} recipes'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.similarity import (SIMILAR_RECIPES_COUNT, build_similarity_index,
+                                store_neighbours)
+from recipes.utils import chunks
+
+
+class Command(BaseCommand):
+    help = 'Precompute the most similar recipes of every recipe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--count', type=int,
+                            default=SIMILAR_RECIPES_COUNT)
+
+    def handle(self, *args, **options):
+        index = build_similarity_index()
+        recipe_ids = Recipe.objects.order_by('pk').values_list(
+            'pk', flat=True).iterator()
+        refreshed = 0
+        for chunk in chunks(recipe_ids, options['batch_size']):
+            store_neighbours({
+                recipe_id: index.neighbours(recipe_id, options['count'])
+                for recipe_id in chunk})
+            refreshed += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed similar recipes of {refreshed} recipes'))
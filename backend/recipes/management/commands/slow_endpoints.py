@@ -0,0 +1,37 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodgram.profiler import load_reports, summarize
+
+
+class Command(BaseCommand):
+    help = 'Report the slowest endpoints recorded by the query profiler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir',
+                            default=settings.QUERY_PROFILER_REPORT_DIR)
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        rows = summarize(load_reports(options['dir']))[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        if not rows:
+            self.stdout.write('No profiler reports found in '
+                              f'{options["dir"]}')
+            return
+        self.stdout.write(
+            f'{"endpoint":<45} {"reqs":>6} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"db p95":>8} {"ser p95":>8} {"queries":>8}')
+        for row in rows:
+            self.stdout.write(
+                f'{row["endpoint"]:<45} {row["requests"]:>6} '
+                f'{row["p50"]:>8.1f} {row["p95"]:>8.1f} {row["p99"]:>8.1f} '
+                f'{row["db_p95"]:>8.1f} {row["serialize_p95"]:>8.1f} '
+                f'{row["queries_avg"]:>8.1f}')
+            for sql, count in row['duplicates']:
+                self.stdout.write(f'    {count:>5}x {sql[:110]}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import update_search_vectors
+from recipes.utils import chunks
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search vectors of all recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.order_by('pk').values_list(
+            'pk', flat=True).iterator()
+        updated = 0
+        for chunk in chunks(recipe_ids, options['batch_size']):
+            updated += update_search_vectors(
+                Recipe.objects.filter(pk__in=chunk))
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated search vectors of {updated} recipes'))
@@ -0,0 +1,77 @@
+import time
+import zlib
+from array import array
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from users.models import Follow
+from .cache import is_shared_cache
+from .models import Favorite, ShoppingCart
+
+MEMBERSHIP_TIMEOUT = 24 * 60 * 60
+MEMBERSHIP_SOURCES = {
+    'favorites': (Favorite, 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'recipe_id'),
+    'following': (Follow, 'following_id'),
+}
+
+Memberships = namedtuple('Memberships',
+                         ('favorites', 'shopping_cart', 'following', 'stamps'))
+
+NO_MEMBERSHIPS = Memberships(frozenset(), frozenset(), frozenset(), ())
+
+
+def membership_key(user_id, kind):
+    return f'memberships:{user_id}:{kind}'
+
+
+def load_membership(user_id, kind, stamp=0):
+    model, field = MEMBERSHIP_SOURCES[kind]
+    ids = model.objects.filter(user_id=user_id).order_by(
+        field).values_list(field, flat=True)
+    stamp = max(int(time.time() * 1000), stamp + 1)
+    return stamp, array('q', ids).tobytes()
+
+
+def load_memberships(user_id):
+    if not is_shared_cache():
+        # A per-process cache would serve sets that other workers have
+        # changed, so load them per request and stamp them by content
+        return [(zlib.crc32(ids), ids) for _, ids in (
+            load_membership(user_id, kind) for kind in MEMBERSHIP_SOURCES)]
+    keys = {kind: membership_key(user_id, kind)
+            for kind in MEMBERSHIP_SOURCES}
+    entries = cache.get_many(keys.values())
+    missing = {key: load_membership(user_id, kind)
+               for kind, key in keys.items() if key not in entries}
+    if missing:
+        cache.set_many(missing, MEMBERSHIP_TIMEOUT)
+        entries.update(missing)
+    return [entries[key] for key in keys.values()]
+
+
+def get_memberships(request):
+    user = getattr(request, 'user', None)
+    if user is None or user.is_anonymous:
+        return NO_MEMBERSHIPS
+    memberships = getattr(request, 'memberships', None)
+    if memberships is None:
+        entries = load_memberships(user.pk)
+        memberships = Memberships(
+            *(frozenset(array('q', ids)) for _, ids in entries),
+            stamps=tuple(stamp for stamp, _ in entries))
+        request.memberships = memberships
+    return memberships
+
+
+def refresh_membership(user_id, kind):
+    def write():
+        key = membership_key(user_id, kind)
+        stamp, _ = cache.get(key) or (0, None)
+        cache.set(key, load_membership(user_id, kind, stamp),
+                  MEMBERSHIP_TIMEOUT)
+
+    if is_shared_cache():
+        transaction.on_commit(write)
@@ -1,4 +1,32 @@
-from rest_framework import mixins, viewsets
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import mixins, status, viewsets
+from rest_framework.response import Response
+
+from .cache import get_version, make_etag, reference_cache
+from .documents import get_cached_page, set_cached_page
+from .memberships import get_memberships
+
+RECIPE_VALIDATOR_FIELDS = (
+    'id', 'updated_at', 'author__email', 'author__username',
+    'author__first_name', 'author__last_name',
+)
+
+
+def validator_values(recipe, fields):
+    values = []
+    for field in fields:
+        value = recipe
+        for name in field.split('__'):
+            value = getattr(value, name)
+        values.append(value)
+    return tuple(values)
+
+
+def get_validator_fields(queryset):
+    ordering = tuple(field.lstrip('-') for field in queryset.query.order_by)
+    return RECIPE_VALIDATOR_FIELDS + tuple(
+        field for field in ordering if field not in RECIPE_VALIDATOR_FIELDS)
 
 
 class RetriveAndListViewSet(
@@ -6,3 +34,91 @@ class RetriveAndListViewSet(
         mixins.RetrieveModelMixin,
         viewsets.GenericViewSet):
     pass
+
+
+class CachedReferenceDataMixin:
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request,
+                                    *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        version = get_version(self.cache_namespace)
+        key = request.get_full_path()
+        # Versions are millisecond stamps, finer than Last-Modified could
+        # express, so revalidation relies on the ETag alone
+        etag = make_etag(self.cache_namespace, key, version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            entry = reference_cache.get(self.cache_namespace, key, version)
+            if entry is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                reference_cache.set(self.cache_namespace, key, version,
+                                    response.data)
+            else:
+                response = Response(entry.data)
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class ConditionalRecipeMixin:
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        recipes = list(queryset if page is None else page)
+        count = None if page is None else self.paginator.get_count()
+
+        def handler():
+            data = self.get_serializer(recipes, many=True).data
+            if page is None:
+                return Response(data)
+            return self.get_paginated_response(data)
+
+        return self.conditional_response(
+            handler, recipes, get_validator_fields(queryset), count, request)
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = self.get_object()
+
+        def handler():
+            return Response(self.get_serializer(recipe).data)
+
+        return self.conditional_response(handler, [recipe],
+                                         RECIPE_VALIDATOR_FIELDS, None,
+                                         request)
+
+    def conditional_response(self, handler, recipes, fields, count, request):
+        if not recipes:
+            return handler()
+        validator = (request.user.pk, get_memberships(request).stamps,
+                     get_version('tags'), get_version('ingredients'), count,
+                     [validator_values(recipe, fields) for recipe in recipes])
+        etag = make_etag('recipes', request.build_absolute_uri(), validator)
+        last_modified = int(max(
+            recipe.updated_at for recipe in recipes).timestamp())
+        # Membership flags and version stamps change without touching
+        # updated_at, so only the ETag can answer with a 304
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.page_response(handler, etag, request)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def page_response(self, handler, etag, request):
+        if not request.user.is_anonymous:
+            return handler()
+        data = get_cached_page(etag)
+        if data is not None:
+            return Response(data)
+        response = handler()
+        set_cached_page(etag, response.data)
+        return response
@@ -1,4 +1,6 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import UniqueConstraint
@@ -13,6 +15,8 @@ class Ingredient(models.Model):
                                         verbose_name='Unit')
 
     class Meta:
+        constraints = [UniqueConstraint(fields=['name', 'measurement_unit'],
+                       name='unique_ingredient')]
         ordering = ('name',)
         verbose_name = 'Ingredient'
         verbose_name_plural = 'Ingredients'
@@ -72,6 +76,10 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name="Dish's image"
     )
+    image_renditions = models.JSONField(
+        default=dict, blank=True, editable=False,
+        verbose_name='Image renditions'
+    )
     text = models.TextField(
         verbose_name='Recipe Description',
         help_text='Add a description of the recipe',
@@ -95,8 +103,27 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name='Date of publication'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Date of update'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Added to favorites'
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Added to shopping lists'
+    )
+    popularity = models.FloatField(
+        default=0, editable=False, verbose_name='Popularity score'
+    )
+    search_vector = SearchVectorField(
+        null=True, editable=False, verbose_name='Search vector'
+    )
 
     class Meta:
+        indexes = [models.Index(fields=['author', '-id'],
+                                name='recipe_author_id_idx'),
+                   models.Index(fields=['-popularity', '-id'],
+                                name='recipe_popularity_idx')]
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
         ordering = ('-id',)
@@ -105,6 +132,22 @@ class Recipe(models.Model):
         return self.name
 
 
+class RecipeIngredientSet(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ingredient_set',
+        verbose_name='Recipe',
+    )
+    ingredient_ids = ArrayField(models.IntegerField(),
+                                verbose_name='Ingredient ids')
+
+    class Meta:
+        verbose_name = 'Recipe ingredient set'
+        verbose_name_plural = 'Recipe ingredient sets'
+
+
 class IngredientRecipe(models.Model):
     ingredient = models.ForeignKey(
         Ingredient,
@@ -154,6 +197,9 @@ class Favorite(models.Model):
         related_name='favorited_by',
         verbose_name='Recipe',
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Date added'
+    )
 
     class Meta:
         constraints = [models.UniqueConstraint(fields=['user', 'recipe'],
@@ -175,6 +221,9 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Recipe in the shopping list',
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Date added'
+    )
 
     class Meta:
         constraints = [UniqueConstraint(fields=['user', 'recipe'],
@@ -182,3 +231,53 @@ class ShoppingCart(models.Model):
         ordering = ('-id',)
         verbose_name = 'Shopping list'
         verbose_name_plural = 'Shopping lists'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Recipe',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Similar recipe',
+    )
+    score = models.FloatField(verbose_name='Similarity')
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=['recipe', 'similar'],
+                       name='unique_similar_recipe')]
+        ordering = ('-score',)
+        verbose_name = 'Similar recipe'
+        verbose_name_plural = 'Similar recipes'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Follower',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Recipe',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Author',
+    )
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=['user', 'recipe'],
+                       name='unique_timeline_entry')]
+        verbose_name = 'Timeline entry'
+        verbose_name_plural = 'Timeline entries'
@@ -1,5 +1,65 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+APPROXIMATE_COUNT_THRESHOLD = 100000
+
+
+class ApproximateCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples::bigint FROM pg_class '
+                        'WHERE relname = %s', [queryset.model._meta.db_table])
+                    row = cursor.fetchone()
+                if row and row[0] > APPROXIMATE_COUNT_THRESHOLD:
+                    return row[0]
+        return super().count
+
+
+class KeysetPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'limit'
+
+    def get_ordering(self, request, queryset, view):
+        return queryset.query.order_by or self.ordering
+
+    def get_count(self):
+        return None
 
 
 class ResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    django_paginator_class = ApproximateCountPaginator
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            page = self.keyset.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.keyset.display_page_controls
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.keyset is not None:
+            return self.keyset.get_html_context()
+        return super().get_html_context()
+
+    def get_count(self):
+        if self.keyset is not None:
+            return None
+        return self.page.paginator.count
@@ -0,0 +1,118 @@
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Case, Func, IntegerField, Value, When
+
+from .models import IngredientRecipe, RecipeIngredientSet
+
+MAX_PANTRY_INGREDIENTS = 200
+MAX_MISSING_INGREDIENTS = 5
+PANTRY_FALLBACK_LIMIT = 500
+
+PANTRY_INDEX_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS intarray',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_ingredient_ids '
+    'ON {sets} USING gin (ingredient_ids gin__int_ops)',
+)
+
+
+class MissingIngredients(Func):
+    template = 'icount(%(expressions)s)'
+    arg_joiner = ' - '
+    output_field = IntegerField()
+
+
+class PantryIndex:
+    def __init__(self, rows):
+        postings = defaultdict(list)
+        self.sizes = Counter()
+        for recipe_id, ingredient_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            self.sizes[recipe_id] += 1
+        self.postings = {ingredient_id: array('q', recipe_ids)
+                         for ingredient_id, recipe_ids in postings.items()}
+
+    def search(self, ingredient_ids, missing, limit):
+        hits = Counter()
+        for ingredient_id in ingredient_ids:
+            hits.update(self.postings.get(ingredient_id, ()))
+        found = [(self.sizes[recipe_id] - count, recipe_id)
+                 for recipe_id, count in hits.items()
+                 if self.sizes[recipe_id] - count <= missing]
+        return sorted(found, key=lambda item: (item[0], -item[1]))[:limit]
+
+
+_pantry_index = None
+_pantry_index_lock = threading.Lock()
+
+
+def get_pantry_index():
+    global _pantry_index
+    with _pantry_index_lock:
+        if _pantry_index is None:
+            _pantry_index = PantryIndex(
+                IngredientRecipe.objects.order_by('recipe_id').values_list(
+                    'recipe_id', 'ingredient_id').iterator())
+        return _pantry_index
+
+
+def reset_pantry_index():
+    global _pantry_index
+    with _pantry_index_lock:
+        _pantry_index = None
+
+
+def update_ingredient_sets(queryset):
+    if connections[queryset.db].vendor != 'postgresql':
+        reset_pantry_index()
+        return 0
+    recipe_ids = list(queryset.values_list('pk', flat=True))
+    sets = defaultdict(list)
+    for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids).order_by(
+            'recipe_id', 'ingredient_id').values_list(
+            'recipe_id', 'ingredient_id').iterator():
+        sets[recipe_id].append(ingredient_id)
+    with transaction.atomic():
+        RecipeIngredientSet.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeIngredientSet.objects.bulk_create(
+            RecipeIngredientSet(recipe_id=recipe_id, ingredient_ids=ids)
+            for recipe_id, ids in sets.items())
+    return len(sets)
+
+
+def search_pantry(queryset, ingredient_ids, missing=0):
+    pantry = sorted(set(ingredient_ids))
+    if connection.vendor == 'postgresql':
+        queryset = queryset.filter(
+            ingredient_set__ingredient_ids__overlap=pantry)
+        if missing:
+            queryset = queryset.annotate(missing_count=MissingIngredients(
+                'ingredient_set__ingredient_ids',
+                Value(pantry, output_field=ArrayField(IntegerField())),
+            )).filter(missing_count__lte=missing)
+        else:
+            queryset = queryset.filter(
+                ingredient_set__ingredient_ids__contained_by=pantry,
+            ).annotate(missing_count=Value(0, output_field=IntegerField()))
+        return queryset.order_by('missing_count', '-id')
+    found = get_pantry_index().search(pantry, missing, PANTRY_FALLBACK_LIMIT)
+    if not found:
+        return queryset.none()
+    return queryset.filter(pk__in=[pk for _, pk in found]).annotate(
+        missing_count=Case(*(When(pk=pk, then=Value(count))
+                             for count, pk in found),
+                           output_field=IntegerField())
+    ).order_by('missing_count', '-id')
+
+
+def create_pantry_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    if connections[using].vendor != 'postgresql':
+        return
+    with connections[using].cursor() as cursor:
+        for sql in PANTRY_INDEX_SQL:
+            cursor.execute(sql.format(
+                sets=RecipeIngredientSet._meta.db_table))
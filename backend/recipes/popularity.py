@@ -0,0 +1,79 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+FAVORITE_WEIGHT = 1.0
+SHOPPING_CART_WEIGHT = 0.5
+# Scores are stored as the log of 1 + sum(weight * exp(age / scale)), with
+# ages measured from a fixed epoch, so that time decay never has to rewrite
+# old rows: a newer event simply adds a larger term. Working in log space
+# keeps the exponent a plain sum that never overflows.
+POPULARITY_EPOCH = datetime(2021, 1, 1, tzinfo=dt_timezone.utc)
+# Scores closer than this in log space are rounding noise, so removing an
+# event from such a score empties it
+SCORE_TOLERANCE = 1e-6
+
+
+def validate_half_life():
+    half_life = settings.POPULARITY_HALF_LIFE_DAYS
+    if not (math.isfinite(half_life) and half_life > 0):
+        raise ImproperlyConfigured(
+            'POPULARITY_HALF_LIFE_DAYS must be a positive number of days')
+
+
+def decay_scale():
+    return settings.POPULARITY_HALF_LIFE_DAYS * 24 * 60 * 60 / math.log(2)
+
+
+def event_score(weight, created_at=None):
+    age = ((created_at or timezone.now()) - POPULARITY_EPOCH).total_seconds()
+    return math.log(weight) + age / decay_scale()
+
+
+def log_add(first, second):
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def as_expression(score):
+    if isinstance(score, (int, float)):
+        return Value(score, output_field=FloatField())
+    return score
+
+
+def add_score(score):
+    score = as_expression(score)
+    return Greatest(F('popularity'), score) + Ln(
+        1 + Exp(-Abs(F('popularity') - score)))
+
+
+def remove_score(score):
+    score = as_expression(score)
+    return Case(
+        When(popularity__gt=score + SCORE_TOLERANCE, then=Greatest(
+            Value(0.0),
+            F('popularity') + Ln(1 - Exp(score - F('popularity'))))),
+        default=Value(0.0),
+        output_field=FloatField())
+
+
+def popularity_delta(instance, weight, sign=1):
+    score = event_score(weight, instance.created_at)
+    return add_score(score) if sign > 0 else remove_score(score)
+
+
+def compute_popularity(sources, chunk_size=10000):
+    scores = defaultdict(float)
+    for model, weight in sources:
+        events = model.objects.order_by().values_list('recipe_id',
+                                                      'created_at')
+        for recipe_id, created_at in events.iterator(chunk_size=chunk_size):
+            scores[recipe_id] = log_add(scores[recipe_id],
+                                        event_score(weight, created_at))
+    return scores
@@ -0,0 +1,237 @@
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank, SearchVector)
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import (Case, F, FloatField, IntegerField, OuterRef,
+                              Subquery, Value, When)
+
+from .models import Ingredient, IngredientRecipe, Recipe
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+RECIPE_SEARCH_FALLBACK_LIMIT = 500
+RECIPE_SEARCH_WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+SNIPPET_WIDTH = 200
+HIGHLIGHT_START = '<b>'
+HIGHLIGHT_STOP = '</b>'
+
+TOKEN_RE = re.compile(r'\w+')
+
+SEARCH_INDEX_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm '
+    'ON {ingredients} USING gin (UPPER(name::text) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector '
+    'ON {recipes} USING gin (search_vector)',
+)
+
+
+def get_search_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_SEARCH_LIMIT
+    return max(1, min(limit, MAX_SEARCH_LIMIT))
+
+
+class IngredientTrie:
+    def __init__(self, ingredients):
+        self.root = {}
+        self.names = []
+        for pk, name in ingredients:
+            key = name.lower()
+            self.names.append((key, pk))
+            node = self.root
+            for char in key:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(pk)
+
+    def startswith(self, prefix, limit):
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        found = []
+        stack = [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            found.extend(node.get(None, ()))
+            stack.extend(node[char] for char in sorted(
+                (char for char in node if char is not None), reverse=True))
+        return found[:limit]
+
+    def search(self, value, limit):
+        value = value.lower()
+        found = self.startswith(value, limit)
+        if len(found) < limit:
+            seen = set(found)
+            for name, pk in self.names:
+                if value in name and pk not in seen:
+                    found.append(pk)
+                    if len(found) == limit:
+                        break
+        return found
+
+
+_trie = None
+_trie_lock = threading.Lock()
+
+
+def get_ingredient_trie():
+    global _trie
+    with _trie_lock:
+        if _trie is None:
+            _trie = IngredientTrie(
+                Ingredient.objects.order_by('name').values_list('pk', 'name'))
+        return _trie
+
+
+def reset_ingredient_trie(**kwargs):
+    global _trie
+    with _trie_lock:
+        _trie = None
+
+
+def search_ingredients(queryset, value, limit=DEFAULT_SEARCH_LIMIT):
+    if connection.vendor == 'postgresql':
+        queryset = queryset.filter(name__icontains=value)
+    else:
+        ids = get_ingredient_trie().search(value, limit)
+        queryset = queryset.filter(pk__in=ids)
+    return queryset.annotate(
+        is_substring=Case(When(name__istartswith=value, then=Value(0)),
+                          default=Value(1),
+                          output_field=IntegerField())
+    ).order_by('is_substring', 'name')
+
+
+def tokenize(value):
+    return TOKEN_RE.findall(value.lower())
+
+
+class RecipeSearchIndex:
+    def __init__(self, documents):
+        self.postings = defaultdict(dict)
+        for pk, weight, text in documents:
+            for token in tokenize(text):
+                postings = self.postings[token]
+                postings[pk] = postings.get(pk, 0) + weight
+
+    def search(self, value, limit):
+        scores = None
+        for token in set(tokenize(value)):
+            postings = self.postings.get(token, {})
+            if scores is None:
+                scores = dict(postings)
+            else:
+                scores = {pk: score + postings[pk]
+                          for pk, score in scores.items() if pk in postings}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return sorted(scores.items(),
+                      key=lambda item: (-item[1], -item[0]))[:limit]
+
+
+def recipe_documents():
+    weights = RECIPE_SEARCH_WEIGHTS
+    for pk, name, text in Recipe.objects.order_by().values_list(
+            'pk', 'name', 'text').iterator():
+        yield pk, weights['A'], name
+        yield pk, weights['C'], text
+    for pk, name in IngredientRecipe.objects.order_by().values_list(
+            'recipe_id', 'ingredient__name').iterator():
+        yield pk, weights['B'], name
+
+
+_recipe_index = None
+_recipe_index_lock = threading.Lock()
+
+
+def get_recipe_search_index():
+    global _recipe_index
+    with _recipe_index_lock:
+        if _recipe_index is None:
+            _recipe_index = RecipeSearchIndex(recipe_documents())
+        return _recipe_index
+
+
+def reset_recipe_search_index():
+    global _recipe_index
+    with _recipe_index_lock:
+        _recipe_index = None
+
+
+def recipe_search_vector():
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = Subquery(
+        IngredientRecipe.objects.filter(recipe=OuterRef('pk')).order_by()
+        .values('recipe').annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names'))
+    return (SearchVector('name', weight='A', config=config)
+            + SearchVector(ingredient_names, weight='B', config=config)
+            + SearchVector('text', weight='C', config=config))
+
+
+def update_search_vectors(queryset):
+    if connections[queryset.db].vendor == 'postgresql':
+        return queryset.update(search_vector=recipe_search_vector())
+    reset_recipe_search_index()
+    return 0
+
+
+def highlight(text, value, width=SNIPPET_WIDTH):
+    terms = set(tokenize(value))
+    matches = [match for match in TOKEN_RE.finditer(text)
+               if match.group().lower() in terms]
+    start = max(matches[0].start() - width // 4, 0) if matches else 0
+    end = start + width
+    parts, position = [], start
+    for match in matches:
+        if match.start() < start:
+            continue
+        if match.end() > end:
+            break
+        parts += [text[position:match.start()], HIGHLIGHT_START,
+                  match.group(), HIGHLIGHT_STOP]
+        position = match.end()
+    parts.append(text[position:end])
+    return ''.join(parts)
+
+
+def search_recipes(queryset, value):
+    if connection.vendor == 'postgresql':
+        config = settings.RECIPE_SEARCH_CONFIG
+        query = SearchQuery(value, config=config)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            search_snippet=SearchHeadline(
+                'text', query, config=config, start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP),
+        ).order_by('-search_rank', '-id')
+    ranked = get_recipe_search_index().search(value,
+                                              RECIPE_SEARCH_FALLBACK_LIMIT)
+    if not ranked:
+        return queryset.none()
+    return queryset.filter(pk__in=[pk for pk, _ in ranked]).annotate(
+        search_rank=Case(*(When(pk=pk, then=Value(score))
+                           for pk, score in ranked),
+                         output_field=FloatField())
+    ).order_by('-search_rank', '-id')
+
+
+def create_search_indexes(using=DEFAULT_DB_ALIAS, **kwargs):
+    if connections[using].vendor != 'postgresql':
+        return
+    with connections[using].cursor() as cursor:
+        for sql in SEARCH_INDEX_SQL:
+            cursor.execute(sql.format(
+                ingredients=Ingredient._meta.db_table,
+                recipes=Recipe._meta.db_table))
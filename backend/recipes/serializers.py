@@ -1,15 +1,24 @@
 from django.contrib.auth import get_user_model
-from django.db.models import F
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 
 from users.serializers import CustomUserSerializer
+from .documents import get_recipe_documents
+from .fields import RenditionsField
+from .images import schedule_renditions
+from .memberships import get_memberships
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                      ShoppingCart, Tag)
+from .pantry import MAX_MISSING_INGREDIENTS, MAX_PANTRY_INGREDIENTS
+from .search import highlight
+from .similarity import schedule_similar_recipes
 
 User = get_user_model()
 
+MAX_BULK_IDS = 100
+
 
 class IngredientsSerializer(serializers.ModelSerializer):
     class Meta:
@@ -35,9 +44,17 @@ class ShowIngredientRecipeSerializer(serializers.ModelSerializer):
 
 
 class ShowRecipeSerializer(serializers.ModelSerializer):
+    images = RenditionsField(source='image_renditions')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+
+class RecipeDocumentListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = data.all() if hasattr(data, 'all') else data
+        return self.child.represent_many(list(recipes))
 
 
 class ShowRecipeFullSerializer(serializers.ModelSerializer):
@@ -46,33 +63,62 @@ class ShowRecipeFullSerializer(serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    images = RenditionsField(source='image_renditions')
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'name',
-                  'image', 'text', 'cooking_time', 'is_favorited',
+                  'image', 'images', 'text', 'cooking_time', 'is_favorited',
                   'is_in_shopping_cart')
+        list_serializer_class = RecipeDocumentListSerializer
+
+    def to_representation(self, recipe):
+        return self.represent_many([recipe])[0]
+
+    def represent_many(self, recipes):
+        request = self.context.get('request')
+        variant = request.build_absolute_uri('/') if request else None
+        documents = get_recipe_documents(recipes, variant,
+                                         super().to_representation)
+        return [self.overlay(document, recipe)
+                for document, recipe in zip(documents, recipes)]
+
+    def overlay(self, document, recipe):
+        data = dict(document)
+        data['author'] = dict(
+            document['author'],
+            is_subscribed=self.fields['author'].get_is_subscribed(
+                recipe.author))
+        data['is_favorited'] = self.get_is_favorited(recipe)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        if self.context.get('pantry'):
+            data['missing_ingredients'] = recipe.missing_count
+        search = self.context.get('search')
+        if search:
+            data['search_snippet'] = (
+                recipe.search_snippet if hasattr(recipe, 'search_snippet')
+                else highlight(recipe.text, search))
+        return data
 
     def get_ingredients(self, obj):
-        ingredients = IngredientRecipe.objects.filter(recipe=obj)
+        ingredients = obj.ingredientrecipe_set.all()
         return ShowIngredientRecipeSerializer(ingredients, many=True).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return Favorite.objects.filter(recipe=obj, user=request.user).exists()
+        return obj.pk in get_memberships(request).favorites
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return ShoppingCart.objects.filter(recipe=obj,
-                                           user=request.user).exists()
+        return obj.pk in get_memberships(request).shopping_cart
 
 
 class AddIngredientRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -84,8 +130,7 @@ class AddRecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
     author = CustomUserSerializer(read_only=True)
     ingredients = AddIngredientRecipeSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
+    tags = serializers.ListField(child=serializers.IntegerField())
     cooking_time = serializers.IntegerField()
 
     class Meta:
@@ -94,20 +139,31 @@ class AddRecipeSerializer(serializers.ModelSerializer):
                   'image', 'text', 'cooking_time')
 
     def validate_ingredients(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
+        if not data:
             raise ValidationError('You need to choose at least 1 ingredient!')
-        for ingredient in ingredients:
-            if int(ingredient['amount']) <= 0:
+        for ingredient in data:
+            if ingredient['amount'] <= 0:
                 raise ValidationError('The quantity must be positive!')
-        ingredients_count = len(ingredients)
-        ingredients_set = len(
-            set([i['id'] for i in ingredients])
-        )
-        if ingredients_count > ingredients_set:
+        ingredients_set = {ingredient['id'] for ingredient in data}
+        if len(data) > len(ingredients_set):
             raise ValidationError('Ingredients should not be repeated')
+        found = set(Ingredient.objects.filter(
+            pk__in=ingredients_set).values_list('pk', flat=True))
+        if found != ingredients_set:
+            raise ValidationError(
+                f'Ingredients do not exist: '
+                f'{sorted(ingredients_set - found)}')
         return data
 
+    def validate_tags(self, data):
+        tags_set = set(data)
+        found = set(Tag.objects.filter(
+            pk__in=tags_set).values_list('pk', flat=True))
+        if found != tags_set:
+            raise ValidationError(
+                f'Tags do not exist: {sorted(tags_set - found)}')
+        return list(tags_set)
+
     def validate_cooking_time(self, data):
         if data <= 0:
             raise ValidationError("Cooking time can't be"
@@ -115,16 +171,38 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         return data
 
     def add_recipe_ingredients(self, ingredients, recipe):
-        for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            amount = ingredient['amount']
-            if (IngredientRecipe.objects.
-               filter(recipe=recipe, ingredient=ingredient_id).exists()):
-                amount += F('amount')
-            IngredientRecipe.objects.update_or_create(
-                recipe=recipe, ingredient=ingredient_id,
-                defaults={'amount': amount})
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient_id=ingredient['id'],
+                             amount=ingredient['amount'])
+            for ingredient in ingredients
+        )
 
+    def update_recipe_ingredients(self, ingredients, recipe):
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        existing = {
+            row.ingredient_id: row
+            for row in IngredientRecipe.objects.filter(recipe=recipe)
+        }
+        removed = [pk for pk in existing if pk not in amounts]
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient__in=removed).delete()
+        changed = []
+        for pk, row in existing.items():
+            if pk in amounts and row.amount != amounts[pk]:
+                row.amount = amounts[pk]
+                changed.append(row)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        self.add_recipe_ingredients(
+            [ingredient for ingredient in ingredients
+             if ingredient['id'] not in existing],
+            recipe)
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags_data = validated_data.pop('tags')
@@ -132,22 +210,31 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         self.add_recipe_ingredients(ingredients_data, recipe)
         recipe.tags.set(tags_data)
+        schedule_renditions(recipe)
+        schedule_similar_recipes(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         recipe.name = validated_data.get('name', recipe.name)
         recipe.text = validated_data.get('text', recipe.text)
         recipe.cooking_time = validated_data.get('cooking_time',
                                                  recipe.cooking_time)
-        recipe.image = validated_data.get('image', recipe.image)
-        if 'ingredients' in self.initial_data:
+        stale = recipe.image_renditions
+        if 'image' in validated_data:
+            recipe.image = validated_data['image']
+            recipe.image_renditions = {}
+        if 'ingredients' in validated_data:
             ingredients = validated_data.pop('ingredients')
-            recipe.ingredients.clear()
-            self.add_recipe_ingredients(ingredients, recipe)
-        if 'tags' in self.initial_data:
+            self.update_recipe_ingredients(ingredients, recipe)
+        if 'tags' in validated_data:
             tags_data = validated_data.pop('tags')
             recipe.tags.set(tags_data)
         recipe.save()
+        if 'image' in validated_data:
+            schedule_renditions(recipe, stale)
+        if 'ingredients' in self.initial_data or 'tags' in self.initial_data:
+            schedule_similar_recipes(recipe)
         return recipe
 
     def to_representation(self, recipe):
@@ -197,3 +284,17 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         context = {'request': request}
         return ShowRecipeSerializer(instance.recipe, context=context).data
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=MAX_BULK_IDS)
+
+
+class PantrySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=MAX_PANTRY_INGREDIENTS)
+    missing = serializers.IntegerField(
+        min_value=0, max_value=MAX_MISSING_INGREDIENTS, default=0)
@@ -0,0 +1,127 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import User
+from .bulk import deleted_in_bulk
+from .cache import bump_version
+from .counters import update_counter
+from .memberships import refresh_membership
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .pantry import update_ingredient_sets
+from .popularity import (FAVORITE_WEIGHT, SHOPPING_CART_WEIGHT,
+                         popularity_delta)
+from .search import reset_ingredient_trie, update_search_vectors
+from .timeline import schedule_fan_out
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    bump_version('ingredients')
+    reset_ingredient_trie()
+    refresh_search(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version('tags')
+
+
+def touch_recipes(recipe_ids):
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+
+
+def refresh_search(queryset):
+    transaction.on_commit(lambda: update_search_vectors(queryset))
+
+
+def refresh_ingredient_sets(queryset):
+    transaction.on_commit(lambda: update_ingredient_sets(queryset))
+
+
+@receiver(post_save, sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    touch_recipes([instance.recipe_id])
+    refresh_search(Recipe.objects.filter(pk=instance.recipe_id))
+    refresh_ingredient_sets(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif pk_set:
+        recipe_ids = pk_set
+    else:
+        return
+    touch_recipes(recipe_ids)
+    if sender is Recipe.ingredients.through:
+        refresh_search(Recipe.objects.filter(pk__in=recipe_ids))
+        refresh_ingredient_sets(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        refresh_search(Recipe.objects.filter(pk=instance.pk))
+        refresh_ingredient_sets(Recipe.objects.filter(pk=instance.pk))
+    if created and not raw:
+        update_counter(User.objects.filter(pk=instance.author_id),
+                       'recipes_count', 1)
+        schedule_fan_out(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    update_counter(User.objects.filter(pk=instance.author_id),
+                   'recipes_count', -1)
+    refresh_search(Recipe.objects.filter(pk=instance.pk))
+    refresh_ingredient_sets(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        refresh_membership(instance.user_id, 'favorites')
+        update_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                       'favorites_count', 1,
+                       popularity=popularity_delta(instance, FAVORITE_WEIGHT))
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    if deleted_in_bulk():
+        return
+    refresh_membership(instance.user_id, 'favorites')
+    update_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                   'favorites_count', -1,
+                   popularity=popularity_delta(instance, FAVORITE_WEIGHT, -1))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        refresh_membership(instance.user_id, 'shopping_cart')
+        update_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                       'shopping_cart_count', 1,
+                       popularity=popularity_delta(instance,
+                                                   SHOPPING_CART_WEIGHT))
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    if deleted_in_bulk():
+        return
+    refresh_membership(instance.user_id, 'shopping_cart')
+    update_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                   'shopping_cart_count', -1,
+                   popularity=popularity_delta(instance,
+                                               SHOPPING_CART_WEIGHT, -1))
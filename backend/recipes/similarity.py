@@ -0,0 +1,171 @@
+import heapq
+import math
+from array import array
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, FloatField, Sum, Value, When
+
+from .models import IngredientRecipe, Recipe, SimilarRecipe
+
+SIMILAR_RECIPES_COUNT = 10
+TAG_WEIGHT = 0.5
+MAX_POSTINGS = 1000
+MAX_CANDIDATES = 100
+
+
+def feature_rows(recipe_ids=None):
+    ingredients = IngredientRecipe.objects.order_by()
+    tags = Recipe.tags.through.objects.order_by()
+    if recipe_ids is not None:
+        ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        tags = tags.filter(recipe_id__in=recipe_ids)
+    yield from ingredients.values_list('recipe_id',
+                                       'ingredient_id').iterator()
+    for recipe_id, tag_id in tags.values_list('recipe_id',
+                                              'tag_id').iterator():
+        yield recipe_id, -tag_id
+
+
+def load_features(recipe_ids=None):
+    features = defaultdict(list)
+    for recipe_id, feature in feature_rows(recipe_ids):
+        features[recipe_id].append(feature)
+    return {recipe_id: frozenset(values)
+            for recipe_id, values in features.items()}
+
+
+def document_frequencies(features):
+    ingredients = [feature for feature in features if feature > 0]
+    tags = [-feature for feature in features if feature < 0]
+    frequencies = dict(
+        IngredientRecipe.objects.filter(ingredient_id__in=ingredients)
+        .order_by().values('ingredient_id').annotate(total=Count('id'))
+        .values_list('ingredient_id', 'total'))
+    frequencies.update(
+        (-tag_id, total) for tag_id, total in
+        Recipe.tags.through.objects.filter(tag_id__in=tags).order_by().values(
+            'tag_id').annotate(total=Count('id')).values_list(
+            'tag_id', 'total'))
+    return frequencies
+
+
+class SimilarityModel:
+    def __init__(self, features, frequencies, total):
+        self.features = features
+        self.weights = {
+            feature: ((TAG_WEIGHT if feature < 0 else 1.0)
+                      * math.log(1 + total / frequency))
+            for feature, frequency in frequencies.items()
+        }
+        self.norms = {}
+
+    def norm(self, recipe_id):
+        if recipe_id not in self.norms:
+            self.norms[recipe_id] = math.sqrt(sum(
+                self.weights.get(feature, 0.0) ** 2
+                for feature in self.features.get(recipe_id, ())))
+        return self.norms[recipe_id]
+
+    def similarity(self, first, second):
+        shared = (self.features.get(first, frozenset())
+                  & self.features.get(second, frozenset()))
+        if not shared:
+            return 0.0
+        dot = sum(self.weights.get(feature, 0.0) ** 2 for feature in shared)
+        return dot / (self.norm(first) * self.norm(second))
+
+    def top(self, recipe_id, candidates, count=SIMILAR_RECIPES_COUNT):
+        scored = ((self.similarity(recipe_id, candidate), candidate)
+                  for candidate in candidates if candidate != recipe_id)
+        return [(candidate, score)
+                for score, candidate in heapq.nlargest(count, scored)
+                if score > 0]
+
+
+class SimilarityIndex(SimilarityModel):
+    def __init__(self, features, total):
+        super().__init__(features, Counter(
+            feature for values in features.values() for feature in values),
+            total)
+        postings = defaultdict(list)
+        for recipe_id in sorted(features):
+            for feature in features[recipe_id]:
+                postings[feature].append(recipe_id)
+        self.postings = {feature: array('q', recipe_ids)
+                         for feature, recipe_ids in postings.items()}
+
+    def neighbours(self, recipe_id, count=SIMILAR_RECIPES_COUNT):
+        candidates = set()
+        for feature in self.features.get(recipe_id, ()):
+            candidates.update(self.postings[feature][-MAX_POSTINGS:])
+        return self.top(recipe_id, candidates, count)
+
+
+def build_similarity_index():
+    return SimilarityIndex(load_features(), Recipe.objects.count())
+
+
+def store_neighbours(neighbours):
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id__in=list(neighbours)).delete()
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                          score=score)
+            for recipe_id, similar in neighbours.items()
+            for similar_id, score in similar)
+
+
+def candidate_recipes(recipe_id, features, weights):
+    ingredients = [feature for feature in features if feature > 0]
+    if not ingredients:
+        return set()
+    overlap = Sum(Case(
+        *(When(ingredient_id=feature, then=Value(weights[feature] ** 2))
+          for feature in ingredients if feature in weights),
+        default=Value(0.0), output_field=FloatField()))
+    return set(
+        IngredientRecipe.objects.filter(ingredient_id__in=ingredients)
+        .exclude(recipe_id=recipe_id).order_by().values('recipe_id')
+        .annotate(overlap=overlap).order_by('-overlap')
+        .values_list('recipe_id', flat=True)[:MAX_CANDIDATES])
+
+
+def merge_neighbour(rows, recipe_id, score):
+    rows = [row for row in rows if row[0] != recipe_id]
+    if score > 0:
+        rows.append((recipe_id, score))
+    return heapq.nlargest(SIMILAR_RECIPES_COUNT, rows,
+                          key=lambda row: row[1])
+
+
+def update_similar_recipes(recipe_id):
+    features = load_features([recipe_id])
+    own = features.get(recipe_id, frozenset())
+    total = Recipe.objects.count()
+    weights = SimilarityModel(features, document_frequencies(own),
+                              total).weights
+    affected = set(SimilarRecipe.objects.filter(
+        similar_id=recipe_id).values_list('recipe_id', flat=True))
+    pool = candidate_recipes(recipe_id, own, weights) | affected
+    features.update(load_features(pool))
+    model = SimilarityModel(features, document_frequencies(
+        frozenset().union(*features.values())), total)
+    neighbours = {recipe_id: model.top(recipe_id, pool)}
+    touched = affected | {similar_id for similar_id, _ in
+                          neighbours[recipe_id]}
+    current = defaultdict(list)
+    for owner, similar_id, score in SimilarRecipe.objects.filter(
+            recipe_id__in=touched).values_list('recipe_id', 'similar_id',
+                                               'score'):
+        current[owner].append((similar_id, score))
+    for owner in touched:
+        neighbours[owner] = merge_neighbour(
+            current[owner], recipe_id, model.similarity(owner, recipe_id))
+    store_neighbours(neighbours)
+    return neighbours[recipe_id]
+
+
+def schedule_similar_recipes(recipe):
+    recipe_id = recipe.pk
+    transaction.on_commit(lambda: update_similar_recipes(recipe_id))
@@ -0,0 +1,236 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import Follow, User
+from .filters import RecipeFilter
+from .images import build_renditions
+from .management.commands.load_ingredients import (STAGING_TABLE_SQL,
+                                                   Command as LoadIngredients)
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, Tag)
+
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram-tests',
+    }
+}
+
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAA'
+         'fFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+OTHER_IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIA'
+               'AACQd1PeAAAADElEQVR4nGNgYPgPAAEDAQAIicLsAAAAAElFTkSuQmCC')
+
+# Token, three membership sets, count, page, tags and ingredient rows
+LIST_QUERIES = 8
+# Token, tag and ingredient checks, savepoint pair, recipe, counter,
+# ingredient rows and the tag set
+CREATE_QUERIES = 12
+# Token, recipe, tag and ingredient checks, savepoint pair, current rows,
+# one delete, update and insert for the diff, the tag set and the recipe
+UPDATE_QUERIES = 12
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RecipeTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook', first_name='Cook',
+            last_name='Cook', password='Secret-pass-42')
+        self.author = User.objects.create_user(
+            email='chef@foodgram.ru', username='chef', first_name='Chef',
+            last_name='Chef', password='Secret-pass-42')
+        self.tags = [Tag.objects.create(name=f'Tag {i}', color='#E26C2D',
+                                        slug=f'tag-{i}') for i in range(2)]
+        self.ingredients = [
+            Ingredient.objects.create(name=f'Ingredient {i}',
+                                      measurement_unit='g')
+            for i in range(30)]
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def create_recipes(self, count, ingredients=2):
+        recipes = []
+        for index in range(count):
+            recipe = Recipe.objects.create(
+                author=self.author, name=f'Recipe {index}',
+                image='recipes/recipe.png', text='Text', cooking_time=10)
+            recipe.tags.set(self.tags)
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                                 amount=index + 1)
+                for ingredient in self.ingredients[:ingredients])
+            recipes.append(recipe)
+        return recipes
+
+
+class RecipeListQueriesTest(RecipeTestCase):
+    def assert_list_queries(self, count):
+        recipes = self.create_recipes(count)
+        Favorite.objects.create(user=self.user, recipe=recipes[0])
+        Follow.objects.create(user=self.user, following=self.author)
+        with self.assertNumQueries(LIST_QUERIES):
+            response = self.client.get('/api/recipes/', {'limit': count})
+        results = response.json()['results']
+        self.assertEqual(len(results), count)
+        self.assertTrue(results[-1]['is_favorited'])
+        self.assertTrue(results[0]['author']['is_subscribed'])
+        self.assertEqual(len(results[0]['ingredients']), 2)
+
+    def test_page_of_6_recipes(self):
+        self.assert_list_queries(6)
+
+    def test_page_of_100_recipes(self):
+        self.assert_list_queries(100)
+
+
+class RecipeWriteTestCase(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = self.settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def recipe_data(self, ingredients, amount):
+        return {
+            'name': 'Recipe', 'text': 'Text', 'cooking_time': 10,
+            'image': IMAGE, 'tags': [tag.pk for tag in self.tags],
+            'ingredients': [{'id': ingredient.pk, 'amount': amount}
+                            for ingredient in ingredients],
+        }
+
+
+class RecipeWriteQueriesTest(RecipeWriteTestCase):
+    def assert_write_queries(self, count):
+        with self.assertNumQueries(CREATE_QUERIES):
+            response = self.client.post(
+                '/api/recipes/',
+                self.recipe_data(self.ingredients[:count], 1), format='json')
+        self.assertEqual(response.status_code, 201)
+        recipe_id = response.json()['id']
+        # Keep all but one ingredient with a new amount and add another one
+        with self.assertNumQueries(UPDATE_QUERIES):
+            response = self.client.patch(
+                f'/api/recipes/{recipe_id}/',
+                self.recipe_data(self.ingredients[1:count + 1], 2),
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        amounts = dict(IngredientRecipe.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+        self.assertEqual(amounts, {ingredient.pk: 2 for ingredient
+                                   in self.ingredients[1:count + 1]})
+
+    def test_recipe_with_2_ingredients(self):
+        self.assert_write_queries(2)
+
+    def test_recipe_with_29_ingredients(self):
+        self.assert_write_queries(29)
+
+
+class RecipeImageTest(RecipeWriteTestCase):
+    def test_replaced_renditions_are_deleted(self):
+        response = self.client.post(
+            '/api/recipes/', self.recipe_data(self.ingredients[:1], 1),
+            format='json')
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        stale = build_renditions(recipe.pk, recipe.image.name)
+        self.client.patch(
+            f'/api/recipes/{recipe.pk}/', {'image': OTHER_IMAGE},
+            format='json')
+        recipe.refresh_from_db()
+        renditions = build_renditions(recipe.pk, recipe.image.name, stale)
+        data = self.client.get(f'/api/recipes/{recipe.pk}/').json()
+        self.assertTrue(data['image'].endswith(recipe.image.name))
+        self.assertEqual(len(data['images']), len(renditions))
+        self.assertFalse(any(default_storage.exists(name)
+                             for name in stale.values()))
+        self.assertTrue(all(default_storage.exists(name)
+                            for name in renditions.values()))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN output is PostgreSQL')
+class RecipeFilterIndexTest(RecipeTestCase):
+    def explain(self, params):
+        request = RequestFactory().get('/api/recipes/')
+        request.user = self.user
+        queryset = RecipeFilter(params, Recipe.objects.all(),
+                                request=request).qs
+        with connection.cursor() as cursor:
+            # The test tables are tiny, so make any usable index win
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assert_index_scan(self, plan, model):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table)
+        indexes = [name for name, info in constraints.items()
+                   if info['index']]
+        self.assertTrue(indexes)
+        self.assertTrue(any(name in plan for name in indexes), plan)
+        self.assertNotIn(f'Seq Scan on {model._meta.db_table} ', plan)
+
+    def test_favorite_filter_uses_index(self):
+        recipes = self.create_recipes(3)
+        Favorite.objects.create(user=self.user, recipe=recipes[0])
+        plan = self.explain({'is_favorited': 'true'})
+        self.assert_index_scan(plan, Favorite)
+
+    def test_shopping_cart_filter_uses_index(self):
+        recipes = self.create_recipes(3)
+        ShoppingCart.objects.create(user=self.user, recipe=recipes[0])
+        plan = self.explain({'is_in_shopping_cart': 'true'})
+        self.assert_index_scan(plan, ShoppingCart)
+
+    def test_tags_filter_uses_index(self):
+        self.create_recipes(3)
+        plan = self.explain({'tags': [self.tags[0].slug]})
+        self.assert_index_scan(plan, Recipe.tags.through)
+
+
+class LoadIngredientsTest(TestCase):
+    records = [
+        {'model': 'recipes.ingredient', 'pk': 1,
+         'fields': {'name': 'соль', 'measurement_unit': ''}},
+        {'name': 'сахар', 'measurement_unit': 'г'},
+        {'name': 'перец', 'measurement_unit': None},
+    ]
+
+    def test_blank_units_are_read_as_empty_strings(self):
+        rows = list(LoadIngredients().read_rows(
+            io.StringIO(json.dumps(self.records)), 'json'))
+        self.assertEqual(rows, [('соль', ''), ('сахар', 'г'), ('перец', '')])
+
+    def test_blank_units_are_loaded(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'ingredients.json')
+        with open(path, 'w', encoding='utf-8') as output:
+            json.dump(self.records, output)
+        call_command('load_ingredients', path, stdout=io.StringIO())
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {('соль', ''), ('сахар', 'г'), ('перец', '')})
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY is PostgreSQL')
+    def test_copy_batch_keeps_blank_units(self):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(STAGING_TABLE_SQL)
+            LoadIngredients().copy_batch([('соль', ''), ('соль', '')])
+        self.assertEqual(
+            list(Ingredient.objects.values_list('name', 'measurement_unit')),
+            [('соль', '')])
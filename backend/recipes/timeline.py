@@ -0,0 +1,115 @@
+import heapq
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from users.models import Follow, User
+from .models import Recipe, TimelineEntry
+from .utils import chunks
+
+TIMELINE_LENGTH = 500
+TIMELINE_BATCH_SIZE = 1000
+
+
+def pulled_authors(user_id):
+    return User.objects.filter(
+        following__user_id=user_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values('pk')
+
+
+def trim_timelines(user_ids):
+    cutoff = TimelineEntry.objects.filter(
+        user=OuterRef('user')).order_by('-recipe_id').values(
+        'recipe_id')[TIMELINE_LENGTH - 1:TIMELINE_LENGTH]
+    TimelineEntry.objects.filter(user_id__in=user_ids,
+                                 recipe_id__lt=Subquery(cutoff)).delete()
+
+
+def push_entries(entries):
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author_id)
+         for user_id, recipe_id, author_id in entries],
+        ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe_id, author_id):
+    if User.objects.filter(
+            pk=author_id,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT).exists():
+        return
+    followers = Follow.objects.filter(following_id=author_id).order_by(
+        'user_id').values_list('user_id', flat=True).iterator()
+    for chunk in chunks(followers, TIMELINE_BATCH_SIZE):
+        with transaction.atomic():
+            push_entries((user_id, recipe_id, author_id)
+                         for user_id in chunk)
+            trim_timelines(chunk)
+
+
+def schedule_fan_out(recipe):
+    recipe_id, author_id = recipe.pk, recipe.author_id
+    transaction.on_commit(lambda: fan_out_recipe(recipe_id, author_id))
+
+
+def latest_recipes(author_ids):
+    return Recipe.objects.filter(author_id__in=author_ids).order_by(
+        '-id').values_list('id', 'author_id')[:TIMELINE_LENGTH]
+
+
+def add_authors(user_id, author_ids):
+    author_ids = list(User.objects.filter(
+        pk__in=author_ids,
+        followers_count__lte=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('pk', flat=True))
+    if not author_ids:
+        return
+    with transaction.atomic():
+        push_entries((user_id, recipe_id, author_id)
+                     for recipe_id, author_id in latest_recipes(author_ids))
+        trim_timelines([user_id])
+
+
+def schedule_add_authors(user_id, author_ids):
+    author_ids = list(author_ids)
+    transaction.on_commit(lambda: add_authors(user_id, author_ids))
+
+
+def remove_authors(user_id, author_ids):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id__in=author_ids).delete()
+
+
+def rebuild_timelines(user_ids):
+    followed = Follow.objects.filter(
+        user_id__in=user_ids,
+        following__followers_count__lte=settings.TIMELINE_FANOUT_LIMIT,
+    ).order_by('user_id').values_list('user_id', 'following_id')
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id__in=user_ids).delete()
+        for user_id, rows in groupby(followed.iterator(),
+                                     key=lambda row: row[0]):
+            push_entries(
+                (user_id, recipe_id, author_id) for recipe_id, author_id
+                in latest_recipes([row[1] for row in rows]))
+
+
+def unique(ids):
+    previous = None
+    for pk in ids:
+        if pk != previous:
+            yield pk
+        previous = pk
+
+
+def get_timeline_ids(user_id):
+    pushed = TimelineEntry.objects.filter(user_id=user_id).order_by(
+        '-recipe_id').values_list('recipe_id', flat=True)[:TIMELINE_LENGTH]
+    pulled = Recipe.objects.filter(
+        author__in=pulled_authors(user_id)).order_by('-id').values_list(
+        'id', flat=True)[:TIMELINE_LENGTH]
+    return list(islice(unique(heapq.merge(
+        list(pushed), list(pulled), reverse=True)), TIMELINE_LENGTH))
@@ -1,9 +1,19 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import URLPattern, include, path
 
 from rest_framework.routers import DefaultRouter
 
+from foodgram.async_views import offload
 from . import views
 
+# The shopping list download streams from the database and stays
+# synchronous, since an offloaded view has to buffer its response
+ASYNC_ROUTES = (
+    'recipes-list', 'recipes-detail', 'recipes-pantry', 'recipes-similar',
+    'recipes-timeline', 'tags-list', 'tags-detail', 'ingredients-list',
+    'ingredients-detail',
+)
+
 router = DefaultRouter()
 
 router.register('ingredients', views.IngredientsViewSet,
@@ -12,6 +22,16 @@ router.register('tags', views.TagsViewSet, basename='tags')
 router.register('recipes', views.RecipeViewSet, basename='recipes')
 
 
+def async_routes(patterns):
+    return [
+        URLPattern(pattern.pattern, offload(pattern.callback),
+                   pattern.default_args, pattern.name)
+        if pattern.name in ASYNC_ROUTES else pattern
+        for pattern in patterns
+    ]
+
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(async_routes(router.urls) if settings.ASGI_MODE
+                     else router.urls)),
 ]
@@ -1,34 +1,105 @@
-from django.http.response import HttpResponse
+import csv
+import io
+import os
+
+from django.conf import settings
+from django.db.models import Sum
+from django.http.response import StreamingHttpResponse
 
 from .models import IngredientRecipe
 
+FILE_FORMATS = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+PDF_FONT_PATH = getattr(settings, 'SHOPPING_CART_PDF_FONT',
+                        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+ITERATOR_CHUNK_SIZE = 500
+
 
 def get_ingredients_list(request):
-    ingredients_dict = {}
-    ingredients = IngredientRecipe.objects.values(
-        'amount',
+    return IngredientRecipe.objects.filter(
+        recipe__shoppingcart__user=request.user
+    ).values(
+        'ingredient__id',
         'ingredient__name',
         'ingredient__measurement_unit'
-    )
-    for ingredient in ingredients:
-        amount = ingredient['amount']
-        name = ingredient['ingredient__name']
-        measurement_unit = ingredient['ingredient__measurement_unit']
-        if name not in ingredients_dict:
-            ingredients_dict[name] = {
-                'measurement_unit': measurement_unit,
-                'amount': amount
-            }
-        else:
-            ingredients_dict[name]['amount'] += amount
-    to_buy = []
-    for item in ingredients_dict:
-        to_buy.append(f'{item} - {ingredients_dict[item]["amount"]} '
-                      f'{ingredients_dict[item]["measurement_unit"]} \n')
-    return to_buy
-
-
-def download_file_response(list_to_download, filename):
-    response = HttpResponse(list_to_download, 'Content-Type: text/plain')
+    ).annotate(
+        amount=Sum('amount')
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def stream_txt(ingredients):
+    for item in ingredients.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield (f'{item["ingredient__name"]} - {item["amount"]} '
+               f'{item["ingredient__measurement_unit"]} \n')
+
+
+def stream_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for item in ingredients.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield writer.writerow((item['ingredient__name'],
+                               item['amount'],
+                               item['ingredient__measurement_unit']))
+
+
+def stream_pdf(ingredients):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    font = 'Helvetica'
+    if os.path.exists(PDF_FONT_PATH):
+        font = 'ShoppingCartFont'
+        pdfmetrics.registerFont(TTFont(font, PDF_FONT_PATH))
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    top, bottom, left, line_height = height - 50, 50, 50, 18
+    y = top
+    page.setFont(font, 12)
+    for item in ingredients.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        if y < bottom:
+            page.showPage()
+            page.setFont(font, 12)
+            y = top
+        page.drawString(left, y, f'{item["ingredient__name"]} - '
+                                 f'{item["amount"]} '
+                                 f'{item["ingredient__measurement_unit"]}')
+        y -= line_height
+    page.save()
+    yield buffer.getvalue()
+
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+STREAMERS = {
+    'txt': stream_txt,
+    'csv': stream_csv,
+    'pdf': stream_pdf,
+}
+
+
+def download_file_response(ingredients, file_format='txt'):
+    response = StreamingHttpResponse(STREAMERS[file_format](ingredients),
+                                     content_type=FILE_FORMATS[file_format])
+    filename = f'to_buy.{file_format}'
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
@@ -5,18 +5,29 @@ from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from foodgram.profiler import ProfiledSerializerMixin
+from .bulk import FAVORITES, SHOPPING_CART, bulk_add, bulk_remove
 from .filters import IngredientsFilter, RecipeFilter
-from .mixins import RetriveAndListViewSet
-from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
-from .paginator import ResultsSetPagination
+from .mixins import (CachedReferenceDataMixin, ConditionalRecipeMixin,
+                     RetriveAndListViewSet)
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                     SimilarRecipe, Tag)
+from .paginator import KeysetPagination, ResultsSetPagination
+from .pantry import search_pantry
 from .permissions import IsAuthorOrAdmin
-from .serializers import (AddRecipeSerializer, FavouriteSerializer,
-                          IngredientsSerializer, ShoppingCartSerializer,
-                          ShowRecipeFullSerializer, TagsSerializer)
-from .utils import download_file_response, get_ingredients_list
+from .search import get_search_limit
+from .serializers import (AddRecipeSerializer, BulkIdsSerializer,
+                          FavouriteSerializer, IngredientsSerializer,
+                          PantrySerializer, ShoppingCartSerializer,
+                          ShowRecipeFullSerializer, ShowRecipeSerializer,
+                          TagsSerializer)
+from .timeline import get_timeline_ids
+from .utils import FILE_FORMATS, download_file_response, get_ingredients_list
 
 
-class IngredientsViewSet(RetriveAndListViewSet):
+class IngredientsViewSet(ProfiledSerializerMixin, CachedReferenceDataMixin,
+                         RetriveAndListViewSet):
+    cache_namespace = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientsSerializer
     permission_classes = [permissions.AllowAny]
@@ -24,15 +35,25 @@ class IngredientsViewSet(RetriveAndListViewSet):
     filterset_class = IngredientsFilter
     pagination_class = None
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            limit = get_search_limit(self.request.query_params.get('limit'))
+            return queryset[:limit]
+        return queryset
 
-class TagsViewSet(RetriveAndListViewSet):
+
+class TagsViewSet(ProfiledSerializerMixin, CachedReferenceDataMixin,
+                  RetriveAndListViewSet):
+    cache_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ProfiledSerializerMixin, ConditionalRecipeMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all().order_by('-id')
     serializer_class = ShowRecipeFullSerializer
     permission_classes = [IsAuthorOrAdmin]
@@ -40,6 +61,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     pagination_class = ResultsSetPagination
 
+    def get_queryset(self):
+        queryset = Recipe.objects.select_related('author').order_by('-id')
+        if self.action == 'pantry':
+            params = self.get_pantry_params()
+            queryset = search_pantry(queryset, params['ingredients'],
+                                     params['missing'])
+        if self.action == 'timeline':
+            queryset = queryset.filter(
+                pk__in=get_timeline_ids(self.request.user.pk))
+        return queryset
+
+    def get_pantry_params(self):
+        params = self.request.query_params
+        serializer = PantrySerializer(data={
+            'ingredients': [pk for value in params.getlist('ingredients')
+                            for pk in value.split(',') if pk],
+            'missing': params.get('missing', 0),
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'pantry':
+            context['pantry'] = True
+        search = self.request.query_params.get('search', '').strip()
+        if self.action == 'list' and search:
+            context['search'] = search
+        return context
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return ShowRecipeFullSerializer
@@ -80,7 +131,52 @@ class RecipeViewSet(viewsets.ModelViewSet):
         shopping_cart.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['post', 'delete'], url_path='favorite',
+            url_name='bulk-favorite',
+            permission_classes=[permissions.IsAuthenticated])
+    def bulk_favorite(self, request):
+        return self.bulk_response(FAVORITES, request)
+
+    @action(detail=False, methods=['post', 'delete'], url_path='shopping_cart',
+            url_name='bulk-shopping-cart',
+            permission_classes=[permissions.IsAuthenticated])
+    def bulk_shopping_cart(self, request):
+        return self.bulk_response(SHOPPING_CART, request)
+
+    def bulk_response(self, relation, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if request.method == 'DELETE':
+            results = bulk_remove(relation, request.user, ids)
+        else:
+            results = bulk_add(relation, request.user, ids)
+        return Response({'results': results})
+
+    @action(detail=False, permission_classes=[permissions.AllowAny])
+    def pantry(self, request):
+        return self.list(request)
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            pagination_class=KeysetPagination)
+    def timeline(self, request):
+        return self.list(request)
+
+    @action(detail=True, permission_classes=[permissions.AllowAny])
+    def similar(self, request, pk):
+        recipe = self.get_object()
+        recipes = [row.similar for row in SimilarRecipe.objects.filter(
+            recipe=recipe).select_related('similar').order_by('-score')]
+        serializer = ShowRecipeSerializer(recipes, many=True,
+                                          context={'request': request})
+        return Response(serializer.data)
+
     @action(detail=False, permission_classes=[permissions.IsAuthenticated])
     def download_shopping_cart(self, request):
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in FILE_FORMATS:
+            return Response(
+                {'errors': f'Unsupported file format: {file_format}'},
+                status=status.HTTP_400_BAD_REQUEST)
         to_buy = get_ingredients_list(request)
-        return download_file_response(to_buy, 'to_buy.txt')
+        return download_file_response(to_buy, file_format)
@@ -0,0 +1,105 @@
+import copy
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from recipes.cache import is_shared_cache
+
+User = get_user_model()
+
+TOKEN_CACHE_SIZE = 1024
+TOKEN_CACHE_TIMEOUT = 15 * 60
+
+
+def token_key(key):
+    return f'auth-token:{key}'
+
+
+SNAPSHOT_FIELDS = (User._meta.pk.attname, 'is_active')
+
+
+class TokenUserCache:
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, stamp):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != stamp:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, stamp, user):
+        with self.lock:
+            self.entries[key] = (stamp, user)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+
+token_users = TokenUserCache()
+
+
+def load_snapshot(key):
+    values = Token.objects.filter(key=key).values_list(
+        *(f'user__{field}' for field in SNAPSHOT_FIELDS)).first()
+    if values is None:
+        return None
+    snapshot = (uuid.uuid4().hex, values)
+    cache.set(token_key(key), snapshot, TOKEN_CACHE_TIMEOUT)
+    return snapshot
+
+
+def get_token_user(key):
+    snapshot = cache.get(token_key(key)) or load_snapshot(key)
+    if snapshot is None:
+        return None
+    stamp, values = snapshot
+    user = token_users.get(key, stamp)
+    if user is None:
+        # The remaining columns are deferred and load on first access
+        user = User.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, values)
+        token_users.set(key, stamp, user)
+    return copy.copy(user)
+
+
+def discard_tokens(keys):
+    token_users.discard(keys)
+    cache.delete_many([token_key(key) for key in keys])
+
+
+def invalidate_tokens(keys):
+    keys = list(keys)
+    discard_tokens(keys)
+    # A concurrent request can cache the old committed row again until the
+    # change commits, so the snapshots are dropped once more after it
+    transaction.on_commit(lambda: discard_tokens(keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        # A per-process cache cannot see revocations made by other workers
+        if not is_shared_cache():
+            return super().authenticate_credentials(key)
+        user = get_token_user(key)
+        if user is None:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return user, Token(key=key, user=user)
@@ -1,5 +1,25 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.dispatch import Signal
+
+# Columns that cached token users depend on
+AUTH_FIELDS = frozenset(('is_active', 'password'))
+
+users_updated = Signal()
+
+
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        if AUTH_FIELDS.isdisjoint(kwargs):
+            return super().update(**kwargs)
+        user_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        users_updated.send(sender=self.model, user_ids=user_ids)
+        return rows
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
 
 
 class User(AbstractUser):
@@ -11,6 +31,12 @@ class User(AbstractUser):
                                   verbose_name='Name')
     last_name = models.CharField(blank=False, max_length=150,
                                  verbose_name='Surname')
+    recipes_count = models.PositiveIntegerField(default=0, editable=False,
+                                                verbose_name='Recipes')
+    followers_count = models.PositiveIntegerField(default=0, editable=False,
+                                                  verbose_name='Followers')
+
+    objects = CustomUserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -18,6 +44,13 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    def refresh_from_db(self, using=None, fields=None):
+        # Load every deferred column at once, e.g. for token users
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using, fields)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
+from recipes.fields import RenditionsField
+from recipes.memberships import get_memberships
 from recipes.models import Recipe
 from .models import Follow
 
@@ -23,11 +25,10 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=self.context['request'].user,
-                                     following=obj).exists()
+        return obj.pk in get_memberships(request).following
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -51,10 +52,11 @@ class FollowSerializer(serializers.ModelSerializer):
 
 
 class FollowingRecipesSerializers(serializers.ModelSerializer):
+    images = RenditionsField(source='image_renditions')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
 class ShowFollowSerializer(serializers.ModelSerializer):
@@ -70,21 +72,18 @@ class ShowFollowSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return obj.follower.filter(user=obj, following=request.user).exists()
+        return obj.pk in get_memberships(request).following
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit is not None:
-            recipes = obj.recipes.all()[:(int(recipes_limit))]
-        else:
-            recipes = obj.recipes.all()
-        context = {'request': request}
+        recipes = getattr(obj, 'latest_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()[:self.context.get('recipes_limit')]
+        context = {'request': self.context.get('request')}
         return FollowingRecipesSerializers(recipes, many=True,
                                            context=context).data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.bulk import deleted_in_bulk
+from recipes.counters import update_counter
+from recipes.memberships import refresh_membership
+from recipes.timeline import remove_authors, schedule_add_authors
+from .authentication import invalidate_tokens
+from .models import Follow, User, users_updated
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        refresh_membership(instance.user_id, 'following')
+        update_counter(User.objects.filter(pk=instance.following_id),
+                       'followers_count', 1)
+        schedule_add_authors(instance.user_id, [instance.following_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if deleted_in_bulk():
+        return
+    refresh_membership(instance.user_id, 'following')
+    update_counter(User.objects.filter(pk=instance.following_id),
+                   'followers_count', -1)
+    remove_authors(instance.user_id, [instance.following_id])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_tokens(Token.objects.filter(user_id=instance.pk).values_list(
+        'key', flat=True))
+
+
+@receiver(users_updated, sender=User)
+def users_bulk_updated(sender, user_ids, **kwargs):
+    invalidate_tokens(Token.objects.filter(
+        user_id__in=user_ids).values_list('key', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
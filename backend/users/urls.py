@@ -2,11 +2,13 @@ from django.urls import include, path
 
 from djoser import views
 
-from users.views import FollowApiView, ListFollowViewSet
+from users.views import BulkFollowApiView, FollowApiView, ListFollowViewSet
 
 urlpatterns = [
     path('users/<int:id>/subscribe/', FollowApiView.as_view(),
          name='subscribe'),
+    path('users/subscribe/', BulkFollowApiView.as_view(),
+         name='bulk-subscribe'),
     path('users/subscriptions/', ListFollowViewSet.as_view(),
          name='subscription'),
     path('auth/token/login/', views.TokenCreateView.as_view(), name='login'),
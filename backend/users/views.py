@@ -1,15 +1,37 @@
+from collections import defaultdict
+
 from django.contrib.auth import get_user_model
+from django.db.models import Value
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from foodgram.profiler import ProfiledSerializerMixin
+from recipes.bulk import FOLLOWING, bulk_add, bulk_remove
+from recipes.models import Recipe
 from recipes.paginator import ResultsSetPagination
+from recipes.serializers import BulkIdsSerializer
 from .models import Follow
 from .serializers import FollowSerializer, ShowFollowSerializer
 
 User = get_user_model()
 
+MAX_RECIPES_LIMIT = 50
+
+LATEST_RECIPES_SQL = '''
+    SELECT * FROM (
+        SELECT recipe.*, ROW_NUMBER() OVER (
+            PARTITION BY recipe.author_id ORDER BY recipe.id DESC
+        ) AS author_position
+        FROM {table} recipe
+        WHERE recipe.author_id IN ({placeholders})
+    ) ranked
+    WHERE ranked.author_position <= %s
+    ORDER BY ranked.author_id, ranked.id DESC
+'''
+
 
 class FollowApiView(APIView):
     permission_classes = [permissions.IsAuthenticated, ]
@@ -30,7 +52,24 @@ class FollowApiView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ListFollowViewSet(generics.ListAPIView):
+class BulkFollowApiView(APIView):
+    permission_classes = [permissions.IsAuthenticated, ]
+
+    def post(self, request):
+        return Response({'results': bulk_add(FOLLOWING, request.user,
+                                             self.get_ids(request))})
+
+    def delete(self, request):
+        return Response({'results': bulk_remove(FOLLOWING, request.user,
+                                                self.get_ids(request))})
+
+    def get_ids(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+
+class ListFollowViewSet(ProfiledSerializerMixin, generics.ListAPIView):
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated, ]
     serializer_class = ShowFollowSerializer
@@ -38,4 +77,41 @@ class ListFollowViewSet(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return User.objects.filter(following__user=user)
+        return User.objects.filter(following__user=user).annotate(
+            is_subscribed=Value(True)).order_by('-id')
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return MAX_RECIPES_LIMIT
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            recipes_limit = -1
+        if recipes_limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'Must be a non-negative integer'})
+        return min(recipes_limit, MAX_RECIPES_LIMIT)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['recipes_limit'] = self.get_recipes_limit()
+        return context
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        authors = page if page is not None else list(queryset)
+        self.attach_latest_recipes(authors, self.get_recipes_limit())
+        return page
+
+    def attach_latest_recipes(self, authors, limit):
+        latest = defaultdict(list)
+        if authors and limit:
+            sql = LATEST_RECIPES_SQL.format(
+                table=Recipe._meta.db_table,
+                placeholders=', '.join(['%s'] * len(authors)))
+            params = [author.pk for author in authors] + [limit]
+            for recipe in Recipe.objects.raw(sql, params):
+                latest[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = latest[author.pk]